@@ -1,49 +1,234 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, g, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
-import sqlite3
 import jwt
 import datetime
 from functools import wraps
+from itertools import tee
+import click
+import cProfile
+import csv
+import hashlib
+import hmac
+import json
 import os
+import time
+
+import catalogue
+import compression
+import database
+import metrics
+from cache import LRUCache
+from career_index import CareerIndex, catalogue_version, get_career_index, read_artifact_header
+from interests import INTERESTS, canonical_interest, mask_interests, normalize_interests
+from metrics import REQUEST_SECONDS, STAGE_SECONDS
+from model import CareerRecommendationModel
+from scoring_pool import get_scoring_pool
+from text_similarity import TextIndex, get_text_index
 
 app = Flask(__name__, static_folder='static')
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
+app.config['DATABASE'] = os.environ.get('DATABASE_PATH', 'career_recommendations.db')
+app.config['DEFAULT_RECOMMENDATIONS'] = 5
+app.config['MAX_RECOMMENDATIONS'] = 50
+# Shared key for /api/recommendations/batch; the endpoint is disabled when unset
+app.config['BATCH_API_KEY'] = os.environ.get('BATCH_API_KEY')
+app.config['RECOMMENDATION_CACHE_SIZE'] = int(os.environ.get('RECOMMENDATION_CACHE_SIZE', 10000))
+app.config['RECOMMENDATION_CACHE_TTL'] = int(os.environ.get('RECOMMENDATION_CACHE_TTL', 3600))
+app.config['TOKEN_CACHE_SIZE'] = int(os.environ.get('TOKEN_CACHE_SIZE', 100000))
+# Upper bound on how long a verified token is trusted without re-checking its signature
+app.config['TOKEN_CACHE_TTL'] = int(os.environ.get('TOKEN_CACHE_TTL', 3600))
+# 'interest' ranks by interest overlap; 'tfidf' by text similarity using the
+# index written by 'flask build-text-index' (falls back to 'interest' if missing)
+app.config['RECOMMENDATION_SCORER'] = os.environ.get('RECOMMENDATION_SCORER', 'interest')
+app.config['TEXT_INDEX_PATH'] = os.environ.get('TEXT_INDEX_PATH', 'career_text_index.npz')
+# Career index artifact written by 'flask build-index'; workers memory-map it
+# instead of parsing the careers table when it matches the catalogue
+app.config['CAREER_INDEX_PATH'] = os.environ.get('CAREER_INDEX_PATH', 'career_index.bin')
+# Request threads per worker when served through asgi.py
+app.config['WEB_THREADS'] = int(os.environ.get('WEB_THREADS', 32))
+# Catalogues this large are scored in a separate process pool (0 processes disables it)
+app.config['SCORING_PROCESSES'] = int(os.environ.get('SCORING_PROCESSES', 0))
+app.config['SCORING_POOL_MIN_CAREERS'] = int(os.environ.get('SCORING_POOL_MIN_CAREERS', 50000))
+# Requests sending this value as X-Profile are run under cProfile (disabled when unset)
+app.config['PROFILE_KEY'] = os.environ.get('PROFILE_KEY')
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', 'profiles')
+# How long shared caches may keep /api/interests and /api/careers/<id> responses
+app.config['PUBLIC_CACHE_MAX_AGE'] = int(os.environ.get('PUBLIC_CACHE_MAX_AGE', 3600))
 CORS(app)
 
+# Shared across requests; keyword tables are built once per process
+recommendation_model = CareerRecommendationModel()
+
+# Rankings keyed by (catalogue version, scorer, explain, compact, limit,
+# sorted interests), so users with the same interests share one entry
+recommendation_cache = LRUCache(app.config['RECOMMENDATION_CACHE_SIZE'],
+                                app.config['RECOMMENDATION_CACHE_TTL'])
+recommendation_cache_version = None
+
+# Verified tokens keyed by SHA-256 of the token, so repeat requests skip
+# the JWT signature check; cleared whenever SECRET_KEY changes
+token_cache = LRUCache(app.config['TOKEN_CACHE_SIZE'], app.config['TOKEN_CACHE_TTL'])
+token_cache_secret = app.config['SECRET_KEY']
+
+# Bump whenever careers_data in init_default_careers changes, so startup seeds
+# again instead of trusting an artifact built from the old list
+DEFAULT_CAREERS_VERSION = 1
+
+def get_db():
+    """Return this thread's pooled connection to the application database"""
+    return database.get_connection(app.config['DATABASE'])
+
+@app.teardown_request
+def release_db(exc):
+    database.release_connection(app.config['DATABASE'])
+
+def load_career_index(conn):
+    """Return the career index, memory-mapped from CAREER_INDEX_PATH when it is current"""
+    return get_career_index(conn, app.config['CAREER_INDEX_PATH'])
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+    profile_key = app.config['PROFILE_KEY']
+    provided = request.headers.get('X-Profile')
+    if profile_key and provided and hmac.compare_digest(provided.encode(), profile_key.encode()):
+        g.profiler = cProfile.Profile()
+        try:
+            g.profiler.enable()
+        except ValueError:
+            # Another request in this process is already being profiled
+            g.profiler = None
+
+@app.after_request
+def stop_request_timer(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+        path = os.path.join(app.config['PROFILE_DIR'],
+                            f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{request.endpoint}.prof')
+        profiler.dump_stats(path)
+        response.headers['X-Profile-File'] = path
+
+    started = g.pop('request_started', None)
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                endpoint=request.endpoint or 'unknown', method=request.method)
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Compress JSON and text bodies for clients accepting gzip or Brotli"""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in compression.COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = compression.choose_encoding(request.accept_encodings)
+    data = response.get_data()
+    if encoding is None or len(data) < compression.MIN_SIZE:
+        return response
+    with STAGE_SECONDS.time(stage='compression'):
+        response.set_data(compression.compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def conditional_json(payload, max_age=None):
+    """
+    Serialize payload with an ETag, answering 304 Not Modified if the client already has it
+    
+    Args:
+        payload: JSON-serializable object, or an already serialized body (bytes)
+        max_age: Let shared caches keep the response this long (seconds); by
+            default it is private and revalidated on every use
+    """
+    body = payload if isinstance(payload, bytes) else app.json.dumps(payload).encode('utf-8')
+    response = Response(body, mimetype='application/json')
+    # Weak, since the compressed and uncompressed bodies are the same payload
+    response.set_etag(hashlib.sha1(body, usedforsecurity=False).hexdigest(), weak=True)
+    if max_age is None:
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    else:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    return response.make_conditional(request)
+
+def query_flag(name, default):
+    """Boolean query parameter, e.g. ?explain=0"""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    return value.lower() not in ('0', 'false', 'no')
+
 # Database initialization
 def init_db():
-    conn = sqlite3.connect('career_recommendations.db')
+    conn = get_db()
     c = conn.cursor()
     
-    # Users table
+    # Users table; interest_mask holds the user's interests as a bitmask of
+    # interest IDs (see interests.INTEREST_REGISTRY)
     c.execute('''CREATE TABLE IF NOT EXISTS users
                  (id INTEGER PRIMARY KEY AUTOINCREMENT,
                   name TEXT NOT NULL,
                   email TEXT UNIQUE NOT NULL,
                   password TEXT NOT NULL,
-                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  interest_mask INTEGER NOT NULL DEFAULT 0)''')
     
-    # User interests table
-    c.execute('''CREATE TABLE IF NOT EXISTS user_interests
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  user_id INTEGER NOT NULL,
-                  interest TEXT NOT NULL,
-                  FOREIGN KEY (user_id) REFERENCES users (id))''')
-    
-    # Career data table (for storing career information)
+    # Career data table (for storing career information); changed_version is
+    # the catalogue version of the last change to the row
     c.execute('''CREATE TABLE IF NOT EXISTS careers
                  (id INTEGER PRIMARY KEY AUTOINCREMENT,
                   name TEXT UNIQUE NOT NULL,
                   description TEXT NOT NULL,
                   required_interests TEXT NOT NULL,
-                  skills TEXT)''')
-    
+                  skills TEXT,
+                  changed_version INTEGER NOT NULL DEFAULT 0)''')
+
+    # Catalogue version, bumped on every change to careers so the
+    # in-memory career index knows when to update; deleted_version is the
+    # version of the last delete, which needs a full rebuild
+    c.execute('''CREATE TABLE IF NOT EXISTS catalogue_version
+                 (id INTEGER PRIMARY KEY CHECK (id = 1),
+                  version INTEGER NOT NULL,
+                  deleted_version INTEGER NOT NULL DEFAULT 0)''')
+    c.execute('INSERT OR IGNORE INTO catalogue_version (id, version) VALUES (1, 0)')
+
+    conn.commit()
+
+    # Upgrade databases created by older versions
+    database.migrate(conn)
+
+    c.execute('CREATE INDEX IF NOT EXISTS idx_careers_changed_version ON careers (changed_version)')
+    for event, columns in (('INSERT', ''), ('UPDATE', ' OF name, description, required_interests, skills')):
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS careers_changed_{event.lower()}
+                      AFTER {event}{columns} ON careers
+                      BEGIN
+                          UPDATE catalogue_version SET version = version + 1 WHERE id = 1;
+                          UPDATE careers SET changed_version = (SELECT version FROM catalogue_version WHERE id = 1)
+                          WHERE id = NEW.id;
+                      END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS careers_changed_delete
+                 AFTER DELETE ON careers
+                 BEGIN
+                     UPDATE catalogue_version SET version = version + 1, deleted_version = version + 1
+                     WHERE id = 1;
+                 END''')
     conn.commit()
-    conn.close()
     
-    # Initialize default careers if not exists
-    init_default_careers()
+    # Initialize default careers if not exists, unless the career index
+    # artifact shows this database was already seeded with the current list
+    header = read_artifact_header(app.config['CAREER_INDEX_PATH'])
+    if (header is None or header.get('seed_version') != DEFAULT_CAREERS_VERSION
+            or header.get('catalogue_version') != catalogue_version(conn)):
+        init_default_careers()
+
+    # Don't carry open connections into forked worker processes
+    database.close_connections()
 
 def init_default_careers():
     """Initialize default career data"""
@@ -110,17 +295,16 @@ def init_default_careers():
         }
     ]
     
-    conn = sqlite3.connect('career_recommendations.db')
+    conn = get_db()
     c = conn.cursor()
     
-    for career in careers_data:
-        c.execute('''INSERT OR IGNORE INTO careers (name, description, required_interests, skills)
+    c.executemany('''INSERT OR IGNORE INTO careers (name, description, required_interests, skills)
                      VALUES (?, ?, ?, ?)''',
-                  (career['name'], career['description'], 
-                   ','.join(career['required_interests']), career['skills']))
+                  [(career['name'], career['description'],
+                    ','.join(career['required_interests']), career['skills'])
+                   for career in careers_data])
     
     conn.commit()
-    conn.close()
 
 # JWT Token decorator
 def token_required(f):
@@ -138,14 +322,56 @@ def token_required(f):
             return jsonify({'error': 'Token is missing'}), 401
         
         try:
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user_id = data['user_id']
+            current_user_id = verify_token(token)
         except:
             return jsonify({'error': 'Token is invalid'}), 401
         
         return f(current_user_id, *args, **kwargs)
     return decorated
 
+def decode_token(token):
+    """Fully verify a token, returning its payload"""
+    return jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+
+def verify_token(token):
+    """Return the user id of a valid token, checking the signature only on a cache miss"""
+    global token_cache_secret
+    if app.config['SECRET_KEY'] != token_cache_secret:
+        # The secret was rotated, earlier verifications no longer hold
+        token_cache.clear()
+        token_cache_secret = app.config['SECRET_KEY']
+
+    key = hashlib.sha256(token.encode()).digest()
+    user_id = token_cache.get(key)
+    if user_id is not None:
+        return user_id
+
+    data = decode_token(token)
+    user_id = data['user_id']
+
+    # Never trust the cached entry past the token's own expiry
+    ttl = app.config['TOKEN_CACHE_TTL']
+    if 'exp' in data:
+        ttl = min(ttl, data['exp'] - time.time())
+    if ttl > 0:
+        token_cache.put(key, user_id, ttl)
+    return user_id
+
+# Batch API key decorator (for back-office jobs, not end users)
+def batch_key_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        batch_key = app.config['BATCH_API_KEY']
+        if not batch_key:
+            return jsonify({'error': 'Batch API is disabled'}), 403
+
+        provided = request.headers.get('X-Batch-Key', '')
+        if not hmac.compare_digest(provided.encode(), batch_key.encode()):
+            return jsonify({'error': 'Invalid batch key'}), 401
+
+        return f(*args, **kwargs)
+    return decorated
+
 # Serve index page
 @app.route('/')
 def index():
@@ -162,22 +388,23 @@ def signup():
     if not name or not email or not password:
         return jsonify({'error': 'All fields are required'}), 400
     
-    conn = sqlite3.connect('career_recommendations.db')
+    conn = get_db()
     c = conn.cursor()
     
     # Check if user exists
-    c.execute('SELECT id FROM users WHERE email = ?', (email,))
-    if c.fetchone():
-        conn.close()
+    with STAGE_SECONDS.time(stage='db_signup_lookup'):
+        c.execute('SELECT id FROM users WHERE email = ?', (email,))
+        existing = c.fetchone()
+    if existing:
         return jsonify({'error': 'Email already registered'}), 400
     
     # Create user
     hashed_password = generate_password_hash(password)
-    c.execute('INSERT INTO users (name, email, password) VALUES (?, ?, ?)',
-              (name, email, hashed_password))
-    user_id = c.lastrowid
-    conn.commit()
-    conn.close()
+    with STAGE_SECONDS.time(stage='db_signup_insert'):
+        c.execute('INSERT INTO users (name, email, password) VALUES (?, ?, ?)',
+                  (name, email, hashed_password))
+        user_id = c.lastrowid
+        conn.commit()
     
     # Generate token
     token = jwt.encode({
@@ -199,11 +426,11 @@ def login():
     if not email or not password:
         return jsonify({'error': 'Email and password are required'}), 400
     
-    conn = sqlite3.connect('career_recommendations.db')
+    conn = get_db()
     c = conn.cursor()
-    c.execute('SELECT id, name, email, password FROM users WHERE email = ?', (email,))
-    user = c.fetchone()
-    conn.close()
+    with STAGE_SECONDS.time(stage='db_login_lookup'):
+        c.execute('SELECT id, name, email, password FROM users WHERE email = ?', (email,))
+        user = c.fetchone()
     
     if not user or not check_password_hash(user[3], password):
         return jsonify({'error': 'Invalid credentials'}), 401
@@ -219,27 +446,34 @@ def login():
         'user': {'id': user[0], 'name': user[1], 'email': user[2]}
     })
 
+# The vocabulary is fixed while the process runs, so its body is built once
+interests_body = app.json.dumps({'interests': list(INTERESTS)}).encode('utf-8')
+
 @app.route('/api/interests', methods=['GET'])
 def get_interests():
-    interests = [
-        'Technology', 'Programming', 'Mathematics', 'Science', 'Engineering',
-        'Art', 'Design', 'Creativity', 'Writing', 'Communication',
-        'Business', 'Finance', 'Marketing', 'Analytics', 'Strategy',
-        'Psychology', 'Human Behavior', 'Research', 'Medicine', 'Biology',
-        'Environment', 'Sustainability', 'Nature', 'Problem Solving',
-        'Innovation', 'Statistics', 'Visual Arts', 'Aesthetics', 'Social Media',
-        'Economics', 'Physics', 'Empathy', 'Language'
-    ]
-    return jsonify({'interests': sorted(interests)})
+    return conditional_json(interests_body, max_age=app.config['PUBLIC_CACHE_MAX_AGE'])
+
+@app.route('/api/careers/<int:career_id>', methods=['GET'])
+def get_career(career_id):
+    """Details of one career, e.g. for recommendations fetched with ?compact=1"""
+    career_index = load_career_index(get_db())
+    position = career_index.position(career_id)
+    if position is None:
+        return jsonify({'error': 'Career not found'}), 404
+
+    return conditional_json({
+        'id': career_id,
+        'career': career_index.names[position],
+        'description': career_index.descriptions[position],
+        'required_interests': list(career_index.interests[position]),
+        'skills': career_index.skills[position]
+    }, max_age=app.config['PUBLIC_CACHE_MAX_AGE'])
 
 @app.route('/api/user/interests', methods=['GET'])
 @token_required
 def get_user_interests(user_id):
-    conn = sqlite3.connect('career_recommendations.db')
-    c = conn.cursor()
-    c.execute('SELECT interest FROM user_interests WHERE user_id = ?', (user_id,))
-    interests = [row[0] for row in c.fetchall()]
-    conn.close()
+    with STAGE_SECONDS.time(stage='db_user_interests'):
+        interests = database.get_user_interests(get_db(), user_id)
     return jsonify({'interests': interests})
 
 @app.route('/api/user/interests', methods=['POST'])
@@ -250,52 +484,273 @@ def save_user_interests(user_id):
     
     if not interests:
         return jsonify({'error': 'At least one interest is required'}), 400
+    if not isinstance(interests, list):
+        return jsonify({'error': 'Interests must be a list'}), 400
     
-    conn = sqlite3.connect('career_recommendations.db')
-    c = conn.cursor()
-    
-    # Delete existing interests
-    c.execute('DELETE FROM user_interests WHERE user_id = ?', (user_id,))
+    interests, unknown = normalize_interests(interests)
+    if unknown:
+        return jsonify({'error': 'Unknown interests', 'unknown': unknown}), 400
     
-    # Insert new interests
-    for interest in interests:
-        c.execute('INSERT INTO user_interests (user_id, interest) VALUES (?, ?)',
-                  (user_id, interest))
-    
-    conn.commit()
-    conn.close()
+    # Only the added and removed interests are written, in one transaction
+    with STAGE_SECONDS.time(stage='db_save_interests'):
+        database.replace_user_interests(get_db(), user_id, interests)
+
+    # Cached rankings are keyed by interest set, not by user, so the new
+    # interests simply map to a different entry; nothing to evict here
     
     return jsonify({'message': 'Interests saved successfully'})
 
 @app.route('/api/recommendations', methods=['GET'])
 @token_required
 def get_recommendations(user_id):
-    # Import the recommendation model
-    from model import CareerRecommendationModel
-    
     # Get user interests
-    conn = sqlite3.connect('career_recommendations.db')
-    c = conn.cursor()
-    c.execute('SELECT interest FROM user_interests WHERE user_id = ?', (user_id,))
-    user_interests = [row[0] for row in c.fetchall()]
+    conn = get_db()
+    with STAGE_SECONDS.time(stage='db_user_interests'):
+        user_interests = database.get_user_interests(conn, user_id)
     
     if not user_interests:
-        conn.close()
         return jsonify({'error': 'Please submit your interests first'}), 400
     
-    # Get all careers
-    c.execute('SELECT name, description, required_interests, skills FROM careers')
-    careers = c.fetchall()
-    conn.close()
-    
-    if not careers:
+    # Get the career index (rebuilt only when the careers table changes)
+    with STAGE_SECONDS.time(stage='careers_fetch'):
+        career_index = load_career_index(conn)
+
+    if not len(career_index):
         return jsonify({'error': 'No careers available'}), 500
-    
+
+    # Number of recommendations, e.g. /api/recommendations?limit=10
+    top_k = request.args.get('limit', app.config['DEFAULT_RECOMMENDATIONS'], type=int)
+    top_k = max(1, min(top_k, app.config['MAX_RECOMMENDATIONS']))
+
+    # Scorer, e.g. /api/recommendations?scorer=tfidf
+    scorer = request.args.get('scorer', app.config['RECOMMENDATION_SCORER'])
+    if scorer not in ('interest', 'tfidf'):
+        return jsonify({'error': 'Unknown scorer'}), 400
+    text_index = None
+    if scorer == 'tfidf':
+        # None (logged once per catalogue version) until the index is rebuilt
+        text_index = get_text_index(app.config['TEXT_INDEX_PATH'], career_index)
+
+    # Rankings only, without explanation texts, e.g. /api/recommendations?explain=0;
+    # ?compact=1 returns just career ids and scores (details at /api/careers/<id>)
+    compact = query_flag('compact', False)
+    explain = query_flag('explain', True) and not compact
+
     # Use the ML model to get recommendations
-    model = CareerRecommendationModel()
-    recommendations = model.get_recommendations(user_interests, careers)
+    recommendations = cached_recommendations(user_interests, career_index, top_k, text_index, explain,
+                                             compact)
     
-    return jsonify({'recommendations': recommendations})
+    # Clients polling for unchanged rankings get a 304 with no body
+    with STAGE_SECONDS.time(stage='json_serialization'):
+        return conditional_json({'recommendations': recommendations})
+
+def cached_recommendations(user_interests, career_index, top_k, text_index=None, explain=True,
+                           compact=False):
+    """Return recommendations from the result cache, computing them on a miss"""
+    global recommendation_cache_version
+    if career_index.version != recommendation_cache_version:
+        # The catalogue changed, every cached ranking is stale
+        recommendation_cache.clear()
+        recommendation_cache_version = career_index.version
+
+    # Interests are scored in sorted order so every user sharing the key
+    # gets the same explanation text
+    user_interests = sorted(user_interests)
+    key = (career_index.version, text_index is not None, explain, compact, top_k, tuple(user_interests))
+    recommendations = recommendation_cache.get(key)
+    if recommendations is None:
+        recommendations = score_recommendations(user_interests, career_index, top_k, text_index, explain,
+                                                compact)
+        recommendation_cache.put(key, recommendations)
+    return recommendations
+
+def score_recommendations(user_interests, career_index, top_k, text_index=None, explain=True,
+                          compact=False):
+    """Score large catalogues in the process pool, everything else in this thread"""
+    if text_index is not None:
+        # Sparse text scoring only touches the user's terms, no need for the pool
+        return recommendation_model.get_recommendations(user_interests, career_index, top_k, text_index,
+                                                        explain, compact)
+
+    processes = app.config['SCORING_PROCESSES']
+    if processes and len(career_index) >= app.config['SCORING_POOL_MIN_CAREERS']:
+        scoring_pool = get_scoring_pool(app.config['DATABASE'], processes, app.config['CAREER_INDEX_PATH'])
+        with STAGE_SECONDS.time(stage='scoring_pool'):
+            return scoring_pool.recommend(user_interests, top_k, explain, compact)
+    return recommendation_model.get_recommendations(user_interests, career_index, top_k,
+                                                    explain=explain, compact=compact)
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify({
+        'recommendations': recommendation_cache.stats(),
+        'tokens': token_cache.stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint"""
+    body = '\n'.join([
+        metrics.render_all(),
+        metrics.render_cache_stats({'recommendations': recommendation_cache, 'tokens': token_cache})
+    ])
+    return Response(body + '\n', mimetype='text/plain; version=0.0.4')
+
+def iter_user_interests(conn, user_ids=None):
+    """Yield (user_id, interests) for every user with interests, in one ordered scan"""
+    c = conn.cursor()
+    if user_ids is None:
+        c.execute('SELECT id, interest_mask FROM users WHERE interest_mask != 0 ORDER BY id')
+    else:
+        c.execute('''SELECT id, interest_mask FROM users
+                     WHERE id IN (SELECT value FROM json_each(?)) AND interest_mask != 0
+                     ORDER BY id''', (json.dumps(user_ids),))
+    for user_id, mask in c:
+        yield user_id, mask_interests(mask)
+
+@app.route('/api/recommendations/batch', methods=['POST'])
+@batch_key_required
+def get_recommendations_batch():
+    """Stream recommendations for many users as NDJSON, one line per user"""
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+
+    # bool is a subclass of int, but true is no user id or limit
+    user_ids = data.get('user_ids')
+    if user_ids is not None and not (isinstance(user_ids, list) and all(
+            isinstance(user_id, int) and not isinstance(user_id, bool) for user_id in user_ids)):
+        return jsonify({'error': 'user_ids must be a list of integers'}), 400
+
+    top_k = data.get('limit', app.config['DEFAULT_RECOMMENDATIONS'])
+    if not isinstance(top_k, int) or isinstance(top_k, bool):
+        return jsonify({'error': 'limit must be an integer'}), 400
+    top_k = max(1, min(top_k, app.config['MAX_RECOMMENDATIONS']))
+
+    explain = data.get('explain', True)
+    compact = data.get('compact', False)
+    if not isinstance(explain, bool) or not isinstance(compact, bool):
+        return jsonify({'error': 'explain and compact must be booleans'}), 400
+
+    def generate():
+        conn = get_db()
+        career_index = load_career_index(conn)
+        users, interest_users = tee(iter_user_interests(conn, user_ids))
+        interest_lists = (interests for _, interests in interest_users)
+        results = recommendation_model.get_recommendations_batch(interest_lists, career_index, top_k,
+                                                                 explain=explain and not compact,
+                                                                 compact=compact)
+        for (user_id, _), recommendations in zip(users, results):
+            yield json.dumps({'user_id': user_id, 'recommendations': recommendations}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.cli.command('import-interests')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--replace', is_flag=True, help="Replace each imported user's existing interests.")
+@click.option('--chunk-size', default=10000, show_default=True, help='Rows written per transaction.')
+def import_interests_command(path, replace, chunk_size):
+    """Bulk import user interests from a CSV file of user_id,interest rows"""
+    skipped = 0
+
+    def read_rows(f):
+        nonlocal skipped
+        for line_number, row in enumerate(csv.reader(f), 1):
+            interest = canonical_interest(row[1]) if len(row) == 2 else None
+            # isdecimal, unlike isdigit, only accepts what int() parses ('²' is a digit)
+            user_id = int(row[0]) if interest is not None and row[0].strip().isdecimal() else None
+            if user_id is None or user_id > database.MAX_INTEGER:
+                # Tolerate a header line
+                if line_number > 1:
+                    skipped += 1
+                continue
+            yield user_id, interest
+
+    init_db()
+    with open(path, newline='', encoding='utf-8') as f:
+        processed = database.bulk_import_user_interests(
+            get_db(), read_rows(f), replace=replace, chunk_size=chunk_size,
+            progress=lambda count: click.echo(f'{count} rows processed')
+        )
+    click.echo(f'Done: {processed} rows processed, {skipped} rows skipped')
+
+@app.cli.command('import-careers')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(catalogue.FORMATS),
+              help='File format (default: from the file extension).')
+@click.option('--chunk-size', default=10000, show_default=True, help='Rows written per transaction.')
+def import_careers_command(path, file_format, chunk_size):
+    """Import careers from a CSV or JSONL export, updating existing careers by name"""
+    if file_format is None:
+        file_format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+    skipped = 0
+    dropped_interests = 0
+
+    def read_rows(f):
+        nonlocal skipped, dropped_interests
+        for line_number, record in catalogue.iter_records(f, file_format):
+            try:
+                row, unknown = catalogue.normalize_career(record)
+            except ValueError as e:
+                skipped += 1
+                click.echo(f'Line {line_number} skipped: {e}', err=True)
+                continue
+            dropped_interests += len(unknown)
+            yield row
+
+    init_db()
+    with open(path, newline='', encoding='utf-8') as f:
+        processed = database.upsert_careers(
+            get_db(), read_rows(f), chunk_size=chunk_size,
+            progress=lambda count: click.echo(f'{count} careers processed')
+        )
+    click.echo(f'Done: {processed} careers processed, {skipped} skipped, '
+               f'{dropped_interests} unknown interests dropped, '
+               f'catalogue version {catalogue_version(get_db())}')
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Fail if any hot query falls back to a full table scan"""
+    init_db()
+    failures = database.check_query_plans(get_db())
+    for sql, detail in failures:
+        click.echo(f'{detail}: {sql}', err=True)
+    if failures:
+        raise SystemExit(1)
+    click.echo(f'All {len(database.HOT_QUERIES)} hot queries use an index')
+
+@app.cli.command('build-text-index')
+@click.option('--output', help='Where to write the index (default TEXT_INDEX_PATH).')
+def build_text_index_command(output):
+    """Build the TF-IDF index used by the 'tfidf' scorer"""
+    init_db()
+    output = output or app.config['TEXT_INDEX_PATH']
+    career_index = load_career_index(get_db())
+    text_index = TextIndex.build(career_index, recommendation_model.interest_keywords)
+
+    # Write next to the target and swap, so workers never read a partial file
+    temporary = output + '.tmp'
+    text_index.save(temporary)
+    os.replace(temporary, output)
+    click.echo(f'Indexed {len(text_index)} careers, {len(text_index.vocabulary)} terms, '
+               f'catalogue version {text_index.catalogue_version} -> {output}')
+
+@app.cli.command('build-index')
+@click.option('--output', help='Where to write the artifact (default CAREER_INDEX_PATH).')
+def build_index_command(output):
+    """Compile the career index into the artifact workers memory-map at startup"""
+    init_db()
+    output = output or app.config['CAREER_INDEX_PATH']
+    career_index = CareerIndex.from_db(get_db())
+
+    # Write next to the target and swap, so workers never map a partial file
+    temporary = output + '.tmp'
+    career_index.save(temporary, seed_version=DEFAULT_CAREERS_VERSION, relations=recommendation_model.relations)
+    os.replace(temporary, output)
+    click.echo(f'Compiled {len(career_index)} careers, {len(career_index.keyword_index)} interests, '
+               f'catalogue version {career_index.version} -> {output}')
 
 if __name__ == '__main__':
     init_db()
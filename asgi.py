@@ -0,0 +1,18 @@
+"""ASGI entry point, e.g. uvicorn asgi:application (see serve.py)"""
+from a2wsgi import WSGIMiddleware
+
+import database
+from app import app, get_db, init_db, load_career_index, recommendation_model
+
+# Requests run on a thread pool per worker process, so a request blocked on
+# SQLite or scoring doesn't hold up the event loop or other requests
+application = WSGIMiddleware(app, workers=app.config['WEB_THREADS'])
+
+# Map the career index artifact (or build the index) and set up the scorer
+# before taking requests, so the first request doesn't pay for it; workers
+# mapping the same artifact share its pages, scoring arrays included
+with app.app_context():
+    # Idempotent; serve.py already ran it, but uvicorn may be started directly
+    init_db()
+    recommendation_model.prepare(load_career_index(get_db()))
+database.close_connections()
@@ -0,0 +1,102 @@
+"""
+End-to-end benchmarks: Flask routes through the test client against a synthetic database
+
+    python -m benchmarks.bench_api --careers 10 1000 --users 1000
+"""
+import argparse
+import datetime
+import json
+import os
+import tempfile
+
+import jwt
+from werkzeug.security import generate_password_hash
+
+from interests import interest_mask
+
+from benchmarks.common import synthetic_careers, synthetic_users, time_each
+
+
+def populate(conn, career_count, user_count):
+    """Fill a fresh database with synthetic careers, users and their interests"""
+    conn.execute('DELETE FROM careers')
+    conn.executemany('INSERT INTO careers (name, description, required_interests, skills) VALUES (?, ?, ?, ?)',
+                     [row[1:] for row in synthetic_careers(career_count)])
+    password = generate_password_hash('benchmark')
+    conn.executemany('INSERT INTO users (id, name, email, password, interest_mask) VALUES (?, ?, ?, ?, ?)',
+                     [(user_id, f'User {user_id}', f'user{user_id}@example.com', password, interest_mask(interests))
+                      for user_id, interests in enumerate(synthetic_users(user_count), 1)])
+    conn.commit()
+
+
+def bench_routes(career_count, user_count, requests):
+    import app as app_module
+    import career_index
+    from app import app, get_db, init_db, recommendation_cache
+
+    app.config['DATABASE'] = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    init_db()
+    populate(get_db(), career_count, user_count)
+    career_index._index = None
+    recommendation_cache.clear()
+
+    client = app.test_client()
+    headers = [
+        {'Authorization': 'Bearer ' + jwt.encode({
+            'user_id': user_id,
+            'exp': datetime.datetime.utcnow() + datetime.timedelta(days=30)
+        }, app.config['SECRET_KEY'])}
+        for user_id in range(1, user_count + 1)
+    ]
+    request_headers = [(headers[i % user_count],) for i in range(requests)]
+
+    def get(path):
+        return lambda request_headers: client.get(path, headers=request_headers)
+
+    # First request builds the career index; keep it out of the timings
+    client.get('/api/recommendations', headers=headers[0])
+
+    results = {'careers': career_count, 'users': user_count}
+    maxsize = recommendation_cache.maxsize
+    recommendation_cache.maxsize = 0
+    results['recommendations_uncached'] = time_each(get('/api/recommendations'), request_headers)
+    recommendation_cache.maxsize = maxsize
+    recommendation_cache.clear()
+    hits_before = recommendation_cache.hits
+    results['recommendations_cached'] = time_each(get('/api/recommendations'), request_headers)
+    results['recommendation_cache_hit_rate'] = round((recommendation_cache.hits - hits_before) / requests, 4)
+    results['user_interests_get'] = time_each(get('/api/user/interests'), request_headers)
+    results['interests_get'] = time_each(lambda _: client.get('/api/interests'), request_headers)
+
+    interest_sets = list(synthetic_users(requests, seed=2))
+    results['user_interests_post'] = time_each(
+        lambda request_headers, interests: client.post('/api/user/interests', json={'interests': interests},
+                                                       headers=request_headers),
+        [(request_headers[i][0], interest_sets[i]) for i in range(requests)]
+    )
+    app_module.database.close_connections()
+    return results
+
+
+def run(career_sizes, user_count, requests):
+    return [bench_routes(career_count, user_count, requests) for career_count in career_sizes]
+
+
+def add_arguments(parser):
+    parser.add_argument('--careers', type=int, nargs='+', default=[10, 1000, 100000],
+                        help='Catalogue sizes')
+    parser.add_argument('--api-users', type=int, default=1000,
+                        help='Users in the synthetic database')
+    parser.add_argument('--requests', type=int, default=1000,
+                        help='Timed requests per route')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_arguments(parser)
+    args = parser.parse_args()
+    print(json.dumps(run(args.careers, args.api_users, args.requests), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Microbenchmark: cost of token_required with and without the verified-token cache
+
+    python -m benchmarks.bench_auth --iterations 20000
+"""
+import argparse
+import datetime
+import json
+import os
+import tempfile
+import timeit
+
+import jwt
+
+
+def per_call_us(func, iterations):
+    """Best of 5 runs, in microseconds per call"""
+    return min(timeit.repeat(func, number=iterations, repeat=5)) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DATABASE_PATH', os.path.join(tempfile.mkdtemp(), 'bench.db'))
+    from app import app, decode_token, init_db, token_cache, verify_token
+
+    init_db()
+    token = jwt.encode({
+        'user_id': 1,
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(days=30)
+    }, app.config['SECRET_KEY'])
+
+    results = {
+        'decode_uncached_us': per_call_us(lambda: decode_token(token), args.iterations),
+        'verify_cached_us': per_call_us(lambda: verify_token(token), args.iterations),
+    }
+
+    # Whole request through the test client, cheapest authenticated route
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    request = lambda: client.get('/api/user/interests', headers=headers)
+    maxsize = token_cache.maxsize
+    token_cache.maxsize = 0
+    token_cache.clear()
+    results['request_uncached_us'] = per_call_us(request, args.requests)
+    token_cache.maxsize = maxsize
+    results['request_cached_us'] = per_call_us(request, args.requests)
+
+    results = {name: round(value, 2) for name, value in results.items()}
+    results['auth_saving_pct'] = round(
+        100 * (1 - results['verify_cached_us'] / results['decode_uncached_us']), 1)
+    results['token_cache'] = token_cache.stats()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Model-level benchmarks: CareerRecommendationModel on synthetic catalogues
+
+    python -m benchmarks.bench_model --careers 10 1000 100000
+"""
+import argparse
+import json
+import time
+
+from career_index import CareerIndex
+from model import CareerRecommendationModel
+
+from benchmarks.common import summarize, synthetic_careers, synthetic_users, time_each
+
+
+def bench_catalogue(model, career_count, samples):
+    """Time the model stages against one catalogue size"""
+    rows = synthetic_careers(career_count)
+    careers_data = [row[1:] for row in rows]
+    users = list(synthetic_users(samples))
+
+    started = time.perf_counter()
+    career_index = CareerIndex(rows)
+    index_build_s = time.perf_counter() - started
+
+    # Warm up the per-index scorer so it isn't counted against the first request
+    model.get_recommendations(users[0], career_index)
+
+    career_interests = [rows[i % career_count][3] for i in range(samples)]
+    return {
+        'careers': career_count,
+        'index_build_ms': round(index_build_s * 1000, 3),
+        'get_recommendations': time_each(
+            model.get_recommendations,
+            [(user, career_index) for user in users]
+        ),
+        'get_recommendations_raw_rows': time_each(
+            model.get_recommendations,
+            [(user, careers_data) for user in users[:max(1, samples // 10)]]
+        ),
+        '_calculate_interest_match': time_each(
+            model._calculate_interest_match,
+            list(zip(users, career_interests))
+        ),
+        '_generate_explanation': time_each(
+            model._generate_explanation,
+            [(user, interests, 'Career', 55.5) for user, interests in zip(users, career_interests)]
+        ),
+    }
+
+
+def bench_batch(model, career_count, user_count):
+    """Time get_recommendations_batch for a whole user population"""
+    career_index = CareerIndex(synthetic_careers(career_count))
+    chunk_samples = []
+    started = time.perf_counter()
+    chunk_started = started
+    for position, _ in enumerate(model.get_recommendations_batch(synthetic_users(user_count), career_index), 1):
+        if position % 1000 == 0:
+            now = time.perf_counter()
+            chunk_samples.append((now - chunk_started) / 1000)
+            chunk_started = now
+    elapsed = time.perf_counter() - started
+    result = summarize(chunk_samples or [elapsed / user_count], elapsed, user_count)
+    result.update({'careers': career_count, 'users': user_count})
+    return result
+
+
+def run(career_sizes, user_sizes, samples, max_cells):
+    model = CareerRecommendationModel()
+    results = {
+        'catalogues': [bench_catalogue(model, size, samples) for size in career_sizes],
+        'batch': [],
+    }
+    for career_count in career_sizes:
+        for user_count in user_sizes:
+            if career_count * user_count > max_cells:
+                results['batch'].append({'careers': career_count, 'users': user_count, 'skipped': True})
+                continue
+            results['batch'].append(bench_batch(model, career_count, user_count))
+    return results
+
+
+def add_arguments(parser):
+    parser.add_argument('--careers', type=int, nargs='+', default=[10, 1000, 100000],
+                        help='Catalogue sizes')
+    parser.add_argument('--users', type=int, nargs='+', default=[1000, 100000],
+                        help='User population sizes for the batch benchmark (e.g. add 1000000)')
+    parser.add_argument('--samples', type=int, default=500,
+                        help='Timed calls per model-level benchmark')
+    parser.add_argument('--max-cells', type=float, default=2e9,
+                        help='Skip batch runs with more users x careers than this')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_arguments(parser)
+    args = parser.parse_args()
+    print(json.dumps(run(args.careers, args.users, args.samples, args.max_cells), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Shared helpers for the benchmark suite: synthetic data and latency summaries"""
+import random
+import time
+
+from interests import INTERESTS
+
+
+def synthetic_careers(count, seed=0):
+    """Return count careers rows (id, name, description, required_interests, skills)"""
+    rng = random.Random(seed)
+    return [
+        (career_id, f'Career {career_id}',
+         f'Synthetic career {career_id} for benchmarking.',
+         ','.join(rng.sample(INTERESTS, rng.randint(3, 6))),
+         'Skill A, Skill B')
+        for career_id in range(1, count + 1)
+    ]
+
+
+def synthetic_users(count, seed=1):
+    """Yield count interest lists, skewed towards popular combinations like real users"""
+    rng = random.Random(seed)
+    popular = [rng.sample(INTERESTS, rng.randint(2, 6)) for _ in range(50)]
+    for _ in range(count):
+        if rng.random() < 0.8:
+            yield list(rng.choice(popular))
+        else:
+            yield rng.sample(INTERESTS, rng.randint(1, 8))
+
+
+def percentile(sorted_samples, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    index = min(len(sorted_samples) - 1, max(0, round(fraction * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+def summarize(samples, elapsed=None, unit_count=None):
+    """
+    Summarize per-operation latencies (seconds)
+    
+    Args:
+        samples: Latency of each timed operation
+        elapsed: Wall time of the whole run, defaults to the sum of samples
+        unit_count: Units processed (e.g. users), defaults to the number of samples
+    """
+    samples = sorted(samples)
+    elapsed = elapsed if elapsed is not None else sum(samples)
+    unit_count = unit_count if unit_count is not None else len(samples)
+    return {
+        'count': len(samples),
+        'p50_ms': round(percentile(samples, 0.50) * 1000, 4),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 4),
+        'mean_ms': round(sum(samples) / len(samples) * 1000, 4),
+        'throughput_per_s': round(unit_count / elapsed, 1) if elapsed else None,
+    }
+
+
+def time_each(func, argument_lists):
+    """Call func once per argument tuple and summarize the latencies"""
+    samples = []
+    clock = time.perf_counter
+    started = clock()
+    for arguments in argument_lists:
+        call_started = clock()
+        func(*arguments)
+        samples.append(clock() - call_started)
+    return summarize(samples, clock() - started)
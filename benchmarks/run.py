@@ -0,0 +1,68 @@
+"""
+Run the whole benchmark suite and write one JSON report
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --careers 10 1000 100000 --users 1000 100000 1000000
+
+Reports from different commits can be diffed field by field; every latency
+block has p50_ms, p99_ms, mean_ms and throughput_per_s.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+from benchmarks import bench_api, bench_model
+
+
+def environment():
+    """Describe the machine and revision the numbers come from"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        'commit': commit or None,
+        'python': sys.version.split()[0],
+        'numpy': numpy_version,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Career recommendation benchmark suite')
+    bench_model.add_arguments(parser)
+    parser.add_argument('--api-users', type=int, default=1000,
+                        help='Users in the synthetic database for the route benchmarks')
+    parser.add_argument('--requests', type=int, default=1000,
+                        help='Timed requests per route')
+    parser.add_argument('--skip-api', action='store_true', help='Only run the model benchmarks')
+    parser.add_argument('--output', help='Write the report here instead of stdout')
+    args = parser.parse_args()
+
+    report = {
+        'environment': environment(),
+        'model': bench_model.run(args.careers, args.users, args.samples, args.max_cells),
+    }
+    if not args.skip_api:
+        report['api'] = bench_api.run(args.careers, args.api_users, args.requests)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,444 @@
+import json
+import sys
+import threading
+from bisect import bisect_left, insort
+
+from interests import mask_ids
+from scoring import VectorizedScorer, np
+
+# Bumped whenever the artifact layout changes; older artifacts are ignored
+ARTIFACT_FORMAT = 2
+ARTIFACT_MAGIC = b'CAREERIX'
+# Arrays in the artifact start on this boundary so they can be viewed in place
+ARTIFACT_ALIGNMENT = 64
+
+
+class CareerIndex:
+    """Pre-tokenized, read-only view of the careers table
+
+    Parsing ``required_interests`` happens once here instead of on every
+    request. The index keeps the interned, lowercased interest tokens of each
+    career plus an inverted ``interest -> career positions`` map, so scoring a
+    user only touches the careers that share at least one interest.
+    """
+
+    def __init__(self, careers_rows, version=None):
+        """
+        Args:
+            careers_rows: Iterable of tuples (id, name, description, required_interests, skills)
+            version: Catalogue version the rows were read at (None for ad-hoc indexes)
+        """
+        self.version = version
+        self.ids = []
+        self.names = []
+        self.descriptions = []
+        self.skills = []
+        self.interests = []
+        self.interest_counts = []
+        self.keyword_index = {}
+        self._related = {}
+        self._related_lock = threading.Lock()
+        # (relations version, VectorizedScorer arrays) stored in an artifact, see load
+        self._scoring = None
+
+        for career_id, name, description, required_interests, skills in careers_rows:
+            self._add(career_id, name, description, required_interests, skills)
+
+    @classmethod
+    def from_careers_data(cls, careers_data):
+        """Build an ad-hoc index from (name, description, required_interests, skills) tuples"""
+        return cls((None,) + tuple(career) for career in careers_data)
+
+    @classmethod
+    def from_db(cls, conn, version=None):
+        """Build an index from the careers table"""
+        if version is None:
+            version = catalogue_version(conn)
+        c = conn.cursor()
+        c.execute('SELECT id, name, description, required_interests, skills FROM careers ORDER BY id')
+        return cls(c, version)
+
+    def __len__(self):
+        return len(self.names)
+
+    @staticmethod
+    def _parse_interests(required_interests):
+        if not required_interests:
+            return ()
+        return tuple(sys.intern(i.strip()) for i in required_interests.split(','))
+
+    @staticmethod
+    def _interest_keys(interests):
+        return {sys.intern(i.lower()) for i in interests}
+
+    def position(self, career_id):
+        """Return the position of the career with this id, or None if it isn't indexed"""
+        position = bisect_left(self.ids, career_id)
+        if position < len(self.ids) and self.ids[position] == career_id:
+            return position
+        return None
+
+    def _add(self, career_id, name, description, required_interests, skills):
+        position = len(self.names)
+        interests = self._parse_interests(required_interests)
+
+        self.ids.append(career_id)
+        self.names.append(name)
+        self.descriptions.append(description)
+        self.skills.append(skills)
+        self.interests.append(interests)
+        self.interest_counts.append(len(interests))
+
+        for interest in self._interest_keys(interests):
+            self.keyword_index.setdefault(interest, []).append(position)
+
+    def _replace(self, position, career_id, name, description, required_interests, skills):
+        interests = self._parse_interests(required_interests)
+        old_keys = self._interest_keys(self.interests[position])
+        new_keys = self._interest_keys(interests)
+
+        self.names[position] = name
+        self.descriptions[position] = description
+        self.skills[position] = skills
+        self.interests[position] = interests
+        self.interest_counts[position] = len(interests)
+
+        for interest in old_keys - new_keys:
+            positions = self.keyword_index[interest]
+            positions.remove(position)
+            if not positions:
+                del self.keyword_index[interest]
+        for interest in new_keys - old_keys:
+            insort(self.keyword_index.setdefault(interest, []), position)
+
+    def updated(self, careers_rows, version):
+        """
+        Return a copy of this index with careers_rows applied, or None if they can't be
+        
+        Rows whose id is already indexed replace that career; new ids must be
+        greater than every indexed id (as AUTOINCREMENT guarantees) and are
+        appended, so positions stay in id order. Only the given rows are
+        parsed, the rest of the index is copied.
+        
+        Args:
+            careers_rows: Iterable of tuples (id, name, description, required_interests, skills)
+            version: Catalogue version the rows were read at
+        """
+        index = CareerIndex((), version)
+        index.ids = _as_list(self.ids)
+        index.names = list(self.names)
+        index.descriptions = list(self.descriptions)
+        index.skills = list(self.skills)
+        index.interests = list(self.interests)
+        index.interest_counts = _as_list(self.interest_counts)
+        index.keyword_index = {interest: _as_list(positions) for interest, positions in self.keyword_index.items()}
+
+        for row in careers_rows:
+            position = bisect_left(index.ids, row[0])
+            if position < len(index.ids) and index.ids[position] == row[0]:
+                index._replace(position, *row)
+            elif position == len(index.ids):
+                index._add(*row)
+            else:
+                return None
+        return index
+
+    def save(self, path, seed_version=None, relations=None):
+        """
+        Write the index to a binary artifact that load can memory-map
+        
+        The file is a JSON header followed by raw arrays: text columns as one
+        UTF-8 buffer plus offsets, career interests as vocabulary ids in CSR
+        layout and the inverted index as one posting list per interest.
+        Text columns also get a validity array, so missing skills load as None.
+        
+        With relations, the VectorizedScorer arrays are stored too (the
+        related postings after the inverted index, and the interest masks),
+        tagged with relations.version, so workers view them instead of
+        building their own copy.
+        """
+        vocabulary = {}
+        interest_tokens = [vocabulary.setdefault(interest, len(vocabulary))
+                           for interests in self.interests for interest in interests]
+        terms = list(self.keyword_index)
+        arrays = {
+            'ids': np.asarray([-1 if career_id is None else career_id for career_id in self.ids], dtype='<i8'),
+            'interest_counts': np.asarray(self.interest_counts, dtype='<i8'),
+            'interest_indptr': _indptr(self.interest_counts),
+            'interest_tokens': np.asarray(interest_tokens, dtype='<i4'),
+            'postings_indptr': _indptr([len(self.keyword_index[term]) for term in terms]),
+            'postings_rows': np.asarray([position for term in terms for position in self.keyword_index[term]],
+                                        dtype='<i8'),
+        }
+        related_ids = None
+        if relations is not None:
+            related_ids, indptr, rows, interest_masks, related_masks = VectorizedScorer.build_arrays(self, relations)
+            arrays['postings_indptr'] = indptr.astype('<i8')
+            arrays['postings_rows'] = rows.astype('<i8')
+            arrays['interest_masks'] = interest_masks.astype('<u8')
+            arrays['related_masks'] = related_masks.astype('<u8')
+        for column in ('names', 'descriptions', 'skills'):
+            arrays[column + '_data'], arrays[column + '_offsets'], arrays[column + '_valid'] = (
+                _encode_strings(getattr(self, column)))
+
+        layout = {}
+        offset = 0
+        for name, array in arrays.items():
+            layout[name] = [array.dtype.str, list(array.shape), offset]
+            offset = _aligned(offset + array.nbytes)
+        header = json.dumps({
+            'format': ARTIFACT_FORMAT,
+            'catalogue_version': self.version,
+            'seed_version': seed_version,
+            'size': len(self),
+            'vocabulary': list(vocabulary),
+            'terms': terms,
+            'relations_version': relations and relations.version,
+            'related_ids': related_ids,
+            'arrays': layout,
+        }).encode('utf-8')
+
+        with open(path, 'wb') as f:
+            f.write(ARTIFACT_MAGIC)
+            f.write(len(header).to_bytes(8, 'little'))
+            f.write(header)
+            data_start = _aligned(f.tell())
+            for name, array in arrays.items():
+                f.seek(data_start + layout[name][2])
+                f.write(array.tobytes())
+            f.truncate(data_start + offset)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Memory-map an artifact written by save, or return None if its format is outdated
+        
+        Arrays are read-only views of the mapped file, so every process
+        loading the same artifact shares one copy in the page cache; only the
+        small vocabulary and per-interest lookup tables are built in memory.
+        """
+        with open(path, 'rb') as f:
+            header, data_start = _read_header(f)
+        if header is None:
+            return None
+
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        arrays = {}
+        for name, (dtype, shape, offset) in header['arrays'].items():
+            dtype = np.dtype(dtype)
+            start = data_start + offset
+            end = start + dtype.itemsize * int(np.prod(shape))
+            arrays[name] = buffer[start:end].view(dtype).reshape(shape)
+
+        index = cls.__new__(cls)
+        index.version = header['catalogue_version']
+        index.ids = arrays['ids']
+        index.names, index.descriptions, index.skills = (
+            _StringColumn(arrays[column + '_data'], arrays[column + '_offsets'], arrays[column + '_valid'])
+            for column in ('names', 'descriptions', 'skills')
+        )
+        index.interests = _InterestColumn(tuple(sys.intern(interest) for interest in header['vocabulary']),
+                                          arrays['interest_indptr'], arrays['interest_tokens'])
+        index.interest_counts = arrays['interest_counts']
+        indptr, rows = arrays['postings_indptr'], arrays['postings_rows']
+        index.keyword_index = {sys.intern(term): rows[indptr[column]:indptr[column + 1]]
+                               for column, term in enumerate(header['terms'])}
+        index._related = {}
+        index._related_lock = threading.Lock()
+        index._scoring = None
+        if header.get('relations_version') is not None:
+            index._scoring = (header['relations_version'], header['related_ids'], indptr, rows,
+                              arrays['interest_masks'], arrays['related_masks'])
+        return index
+
+    def scoring_arrays(self, relations):
+        """Return the VectorizedScorer arrays stored for relations (see save), or None"""
+        if self._scoring is None or self._scoring[0] != relations.version:
+            return None
+        return self._scoring[1:]
+
+    def related_positions(self, relations):
+        """
+        Return {interest id: sorted positions of careers with an interest related to it}
+        
+        Built once per InterestRelations from the distinct career interests;
+        concurrent first callers wait for that one build.
+        """
+        related = self._related.get(relations)
+        if related is None:
+            with self._related_lock:
+                related = self._related.get(relations)
+                if related is None:
+                    related = self._build_related_positions(relations)
+                    self._related[relations] = related
+        return related
+
+    def _build_related_positions(self, relations):
+        arrays = self.scoring_arrays(relations)
+        if arrays is not None:
+            # Views of the related postings stored after the inverted index
+            related_ids, indptr, rows = arrays[:3]
+            return {related_id: rows[indptr[column]:indptr[column + 1]]
+                    for column, related_id in enumerate(related_ids, len(self.keyword_index))}
+
+        matched = {}
+        for interest, positions in self.keyword_index.items():
+            mask = relations.related_mask(interest)
+            if not mask:
+                continue
+            if not isinstance(positions, list):
+                # Memory-mapped posting list, see load
+                positions = positions.tolist()
+            for related_id in mask_ids(mask):
+                matched.setdefault(related_id, set()).update(positions)
+        return {related_id: sorted(positions) for related_id, positions in sorted(matched.items())}
+
+
+class _StringColumn:
+    """Read-only sequence of strings (or None) stored as one UTF-8 buffer plus offsets"""
+
+    def __init__(self, data, offsets, valid):
+        self.data = data
+        self.offsets = offsets
+        self.valid = valid
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position):
+        if not self.valid[position]:
+            return None
+        return self.data[self.offsets[position]:self.offsets[position + 1]].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        return (self[position] for position in range(len(self)))
+
+
+class _InterestColumn:
+    """Read-only sequence of interest tuples stored as vocabulary ids in CSR layout"""
+
+    def __init__(self, vocabulary, indptr, tokens):
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.tokens = tokens
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def __getitem__(self, position):
+        tokens = self.tokens[self.indptr[position]:self.indptr[position + 1]]
+        return tuple(self.vocabulary[token] for token in tokens.tolist())
+
+    def __iter__(self):
+        return (self[position] for position in range(len(self)))
+
+
+def _as_list(values):
+    """Plain list copy of a list or (memory-mapped) array"""
+    return values.tolist() if hasattr(values, 'tolist') else list(values)
+
+
+def _aligned(offset):
+    return -(-offset // ARTIFACT_ALIGNMENT) * ARTIFACT_ALIGNMENT
+
+
+def _indptr(lengths):
+    indptr = np.zeros(len(lengths) + 1, dtype='<i8')
+    np.cumsum(lengths, out=indptr[1:])
+    return indptr
+
+
+def _encode_strings(values):
+    """Encode strings as (UTF-8 buffer, offsets, validity), None as an empty string marked invalid"""
+    encoded = [b'' if value is None else value.encode('utf-8') for value in values]
+    return (np.frombuffer(b''.join(encoded), dtype=np.uint8),
+            _indptr([len(value) for value in encoded]),
+            np.asarray([value is not None for value in values], dtype=np.uint8))
+
+
+def _read_header(f):
+    """Return (header, data offset) of an open artifact, or (None, None) if it is not a current one"""
+    if f.read(len(ARTIFACT_MAGIC)) != ARTIFACT_MAGIC:
+        return None, None
+    length = int.from_bytes(f.read(8), 'little')
+    header = json.loads(f.read(length).decode('utf-8'))
+    if header.get('format') != ARTIFACT_FORMAT:
+        return None, None
+    return header, _aligned(f.tell())
+
+
+def read_artifact_header(path):
+    """Return the header of the artifact at path, or None if it is missing or outdated"""
+    try:
+        with open(path, 'rb') as f:
+            return _read_header(f)[0]
+    except (OSError, ValueError):
+        return None
+
+
+def catalogue_version(conn):
+    """Return the current careers catalogue version"""
+    c = conn.cursor()
+    c.execute('SELECT version FROM catalogue_version WHERE id = 1')
+    row = c.fetchone()
+    return row[0] if row else 0
+
+
+def changed_careers(conn, since):
+    """
+    Return the careers rows changed after catalogue version since, ordered by id
+    
+    Returns None if a career was deleted since then, which an index can
+    only follow by rebuilding.
+    """
+    c = conn.cursor()
+    c.execute('SELECT deleted_version FROM catalogue_version WHERE id = 1')
+    row = c.fetchone()
+    if row is None or row[0] > since:
+        return None
+    c.execute('''SELECT id, name, description, required_interests, skills FROM careers
+                 WHERE changed_version > ?''', (since,))
+    return sorted(c.fetchall())
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _load_artifact(path, version):
+    """Memory-map the artifact at path if it was built at this catalogue version"""
+    if np is None or not path:
+        return None
+    try:
+        index = CareerIndex.load(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    if index is None or index.version != version:
+        return None
+    return index
+
+
+def get_career_index(conn, artifact_path=None):
+    """
+    Return the process-wide CareerIndex, rebuilding it only if the catalogue changed
+    
+    When artifact_path holds an artifact built at the current catalogue
+    version it is memory-mapped instead of re-reading the careers table.
+    Otherwise careers changed since the previous index are applied to a copy
+    of it, and the whole table is only read again after a delete.
+    """
+    global _index
+    version = catalogue_version(conn)
+    index = _index
+    if index is not None and index.version == version:
+        return index
+
+    with _index_lock:
+        if _index is None or _index.version != version:
+            index = _load_artifact(artifact_path, version)
+            if index is None and _index is not None and _index.version < version:
+                changed = changed_careers(conn, _index.version)
+                if changed is not None:
+                    index = _index.updated(changed, version)
+            _index = index if index is not None else CareerIndex.from_db(conn, version)
+        return _index
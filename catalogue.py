@@ -0,0 +1,84 @@
+"""Reading career catalogues exported as CSV or JSON Lines"""
+import csv
+import json
+import re
+
+from interests import normalize_interests
+
+FORMATS = ('csv', 'jsonl')
+
+# Separators accepted between interests or skills given as one string
+_LIST_SEPARATOR = re.compile(r'[,;|]')
+
+
+def _split(value):
+    """Items of a list, or of a string separated by , ; or |"""
+    if isinstance(value, str):
+        items = _LIST_SEPARATOR.split(value)
+    elif isinstance(value, list) and all(isinstance(item, str) for item in value):
+        items = value
+    else:
+        raise ValueError('must be a list or a separated string')
+    return [item.strip() for item in items if item.strip()]
+
+
+def iter_records(f, file_format):
+    """
+    Yield (line number, record) for every career in an open CSV or JSONL file
+
+    CSV files need a header row naming the columns. Lines that are not valid
+    JSON are yielded with a record of None.
+    """
+    if file_format == 'csv':
+        # Line numbers of data rows start after the header
+        yield from enumerate(csv.DictReader(f), 2)
+        return
+
+    for line_number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError:
+            yield line_number, None
+
+
+def normalize_career(record):
+    """
+    Validate a career record and convert it to a careers row
+
+    Interests are mapped to their vocabulary spelling; unknown ones are
+    dropped, but a career needs at least one known interest.
+
+    Returns:
+        Tuple (row, unknown): the (name, description, required_interests, skills)
+        row to store, and the interests that were dropped
+
+    Raises:
+        ValueError: If the record can't be stored
+    """
+    if not isinstance(record, dict):
+        raise ValueError('not a JSON object')
+
+    name = record.get('name')
+    description = record.get('description')
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError('missing name')
+    if not isinstance(description, str) or not description.strip():
+        raise ValueError('missing description')
+
+    try:
+        interests, unknown = normalize_interests(_split(record.get('required_interests') or ''))
+    except ValueError as e:
+        raise ValueError(f'required_interests {e}') from None
+    if not interests:
+        raise ValueError('no known interests')
+
+    skills = record.get('skills')
+    if skills is not None:
+        try:
+            skills = ', '.join(_split(skills)) or None
+        except ValueError as e:
+            raise ValueError(f'skills {e}') from None
+
+    return (name.strip(), description.strip(), ','.join(interests), skills), unknown
@@ -0,0 +1,44 @@
+"""Negotiated gzip / Brotli compression of response bodies"""
+import gzip
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, clients then get gzip
+    brotli = None
+
+BROTLI_AVAILABLE = brotli is not None
+
+# Bodies smaller than this (bytes) are sent as they are
+MIN_SIZE = 512
+
+COMPRESSIBLE_MIMETYPES = frozenset([
+    'application/json', 'application/javascript', 'text/css', 'text/html', 'text/plain'
+])
+
+GZIP_LEVEL = 6
+# Brotli's higher qualities are meant for static assets, too slow per request
+BROTLI_QUALITY = 5
+
+
+def choose_encoding(accept_encodings):
+    """
+    Pick the content coding for a response
+
+    Args:
+        accept_encodings: The request's parsed Accept-Encoding header (request.accept_encodings)
+
+    Returns:
+        'br' or 'gzip', whichever the client prefers (Brotli on a tie), or None
+    """
+    candidates = [('br', accept_encodings.quality('br'))] if BROTLI_AVAILABLE else []
+    candidates.append(('gzip', accept_encodings.quality('gzip')))
+    encoding, quality = max(candidates, key=lambda candidate: candidate[1])
+    return encoding if quality > 0 else None
+
+
+def compress(data, encoding):
+    """Compress a response body with the encoding returned by choose_encoding"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    # mtime=0 keeps the output identical for identical bodies
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
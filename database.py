@@ -0,0 +1,295 @@
+import logging
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from itertools import groupby, islice
+
+from interests import INTEREST_IDS, interest_id, interest_mask, mask_interests
+
+logger = logging.getLogger(__name__)
+
+# Applied to every new connection. WAL lets readers run alongside the single
+# writer; synchronous=NORMAL is durable under WAL except on power loss.
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -16000),       # KiB, ~16 MB page cache per connection
+    ('mmap_size', 268435456),     # 256 MB memory-mapped reads
+    ('temp_store', 'MEMORY'),
+    ('busy_timeout', 5000),       # ms to wait on a locked database
+)
+
+# Number of prepared statements kept per connection
+STATEMENT_CACHE_SIZE = 256
+
+# Largest value of an SQLite INTEGER; bigger Python ints can't be bound
+MAX_INTEGER = (1 << 63) - 1
+
+_local = threading.local()
+
+
+def connect(path):
+    """Open a new tuned connection to the database at path"""
+    conn = sqlite3.connect(path, cached_statements=STATEMENT_CACHE_SIZE)
+    c = conn.cursor()
+    for name, value in PRAGMAS:
+        c.execute(f'PRAGMA {name} = {value}')
+    c.close()
+    return conn
+
+
+def get_connection(path):
+    """Return this thread's connection to the database at path, opening it on first use"""
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(path)
+    if conn is None:
+        conn = connections[path] = connect(path)
+    return conn
+
+
+def release_connection(path):
+    """Roll back anything left uncommitted so the connection can be reused"""
+    conn = getattr(_local, 'connections', {}).get(path)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+
+
+def close_connections():
+    """Close every connection opened by this thread"""
+    connections = getattr(_local, 'connections', {})
+    while connections:
+        _, conn = connections.popitem()
+        conn.close()
+
+
+@contextmanager
+def write_transaction(conn):
+    """Run a block in an IMMEDIATE transaction, committing on success
+
+    Taking the write lock up front means a read-then-write block never has
+    to upgrade its snapshot, which fails under WAL if another writer got in.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn.cursor()
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def get_user_interests(conn, user_id):
+    """Return a user's stored interests, in interest ID order"""
+    c = conn.cursor()
+    c.execute('SELECT interest_mask FROM users WHERE id = ?', (user_id,))
+    row = c.fetchone()
+    return mask_interests(row[0]) if row else []
+
+
+def replace_user_interests(conn, user_id, interests):
+    """
+    Make a user's stored interests equal to interests (known interests only)
+    
+    Returns:
+        Tuple (added, removed) of the interests that changed
+    """
+    mask = interest_mask(interests)
+    with write_transaction(conn) as c:
+        c.execute('SELECT interest_mask FROM users WHERE id = ?', (user_id,))
+        row = c.fetchone()
+        existing = row[0] if row else 0
+        if mask != existing:
+            c.execute('UPDATE users SET interest_mask = ? WHERE id = ?', (mask, user_id))
+    return mask_interests(mask & ~existing), mask_interests(existing & ~mask)
+
+
+def bulk_import_user_interests(conn, rows, replace=False, chunk_size=10000, progress=None):
+    """
+    Load (user_id, interest) rows for many existing users in chunked transactions
+    
+    Args:
+        conn: Database connection
+        rows: Iterable of (user_id, interest) tuples, interests already canonical
+        replace: Drop each user's existing interests the first time the user is seen
+        chunk_size: Rows written per transaction
+        progress: Optional callback called with the number of rows processed so far
+    
+    Returns:
+        Number of rows processed
+    """
+    rows = iter(rows)
+    replaced_users = set()
+    processed = 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return processed
+
+        masks = {}
+        for user_id, interest in chunk:
+            masks[user_id] = masks.get(user_id, 0) | 1 << INTEREST_IDS[interest]
+        replaced = {user_id for user_id in masks if replace and user_id not in replaced_users}
+        with write_transaction(conn) as c:
+            c.executemany('UPDATE users SET interest_mask = ? WHERE id = ?',
+                          [(masks[user_id], user_id) for user_id in replaced])
+            c.executemany('UPDATE users SET interest_mask = interest_mask | ? WHERE id = ?',
+                          [(mask, user_id) for user_id, mask in masks.items() if user_id not in replaced])
+        replaced_users.update(replaced)
+
+        processed += len(chunk)
+        if progress is not None:
+            progress(processed)
+
+
+def upsert_careers(conn, rows, chunk_size=10000, progress=None):
+    """
+    Insert or update careers by name in chunked transactions
+    
+    Careers whose stored fields already equal the imported ones are left
+    untouched, so re-importing an unchanged file doesn't bump the catalogue
+    version.
+    
+    Args:
+        conn: Database connection
+        rows: Iterable of (name, description, required_interests, skills) tuples, already validated
+        chunk_size: Rows written per transaction
+        progress: Optional callback called with the number of rows processed so far
+    
+    Returns:
+        Number of rows processed
+    """
+    rows = iter(rows)
+    processed = 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return processed
+
+        with write_transaction(conn) as c:
+            c.executemany('''INSERT INTO careers (name, description, required_interests, skills)
+                             VALUES (?, ?, ?, ?)
+                             ON CONFLICT (name) DO UPDATE SET
+                                 description = excluded.description,
+                                 required_interests = excluded.required_interests,
+                                 skills = excluded.skills
+                             WHERE careers.description IS NOT excluded.description
+                                OR careers.required_interests IS NOT excluded.required_interests
+                                OR careers.skills IS NOT excluded.skills''', chunk)
+
+        processed += len(chunk)
+        if progress is not None:
+            progress(processed)
+
+
+def _user_interests_without_rowid(c):
+    """Rebuild user_interests as a WITHOUT ROWID table keyed on (user_id, interest)"""
+    c.execute('PRAGMA table_info(user_interests)')
+    if 'id' not in {row[1] for row in c.fetchall()}:
+        return
+
+    c.execute('''CREATE TABLE user_interests_new
+                 (user_id INTEGER NOT NULL,
+                  interest TEXT NOT NULL,
+                  PRIMARY KEY (user_id, interest),
+                  FOREIGN KEY (user_id) REFERENCES users (id))
+                 WITHOUT ROWID''')
+    # Older write paths could store the same interest twice
+    c.execute('''INSERT OR IGNORE INTO user_interests_new (user_id, interest)
+                 SELECT user_id, interest FROM user_interests''')
+    c.execute('DROP TABLE user_interests')
+    c.execute('ALTER TABLE user_interests_new RENAME TO user_interests')
+
+
+def _careers_change_tracking(c):
+    """Stamp careers with the catalogue version that last changed them, so indexes can update incrementally"""
+    c.execute('PRAGMA table_info(careers)')
+    if 'changed_version' not in {row[1] for row in c.fetchall()}:
+        c.execute('ALTER TABLE careers ADD COLUMN changed_version INTEGER NOT NULL DEFAULT 0')
+    # init_db creates catalogue_version with this column when upgrading from
+    # databases that predate the table
+    c.execute('PRAGMA table_info(catalogue_version)')
+    if 'deleted_version' not in {row[1] for row in c.fetchall()}:
+        c.execute('ALTER TABLE catalogue_version ADD COLUMN deleted_version INTEGER NOT NULL DEFAULT 0')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_careers_changed_version ON careers (changed_version)')
+    # Replaced by the careers_changed_* triggers created in init_db
+    for event in ('insert', 'update', 'delete'):
+        c.execute(f'DROP TRIGGER IF EXISTS careers_version_{event}')
+
+
+def _user_interest_masks(c):
+    """Fold user_interests rows into a users.interest_mask bitmask and drop the table"""
+    c.execute('PRAGMA table_info(users)')
+    if 'interest_mask' not in {row[1] for row in c.fetchall()}:
+        c.execute('ALTER TABLE users ADD COLUMN interest_mask INTEGER NOT NULL DEFAULT 0')
+
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_interests'")
+    if c.fetchone() is None:
+        return
+    # Interests outside the registry can't be stored and are dropped. Saving
+    # them has been rejected since the vocabulary was introduced, but older
+    # databases may hold some, so they are reported
+    dropped = Counter()
+
+    def user_masks():
+        rows = c.connection.execute('SELECT user_id, interest FROM user_interests ORDER BY user_id')
+        for user_id, user_rows in groupby(rows, key=lambda row: row[0]):
+            interests = [row[1] for row in user_rows]
+            dropped.update(interest for interest in interests if interest_id(interest) is None)
+            yield interest_mask(interests), user_id
+
+    c.executemany('UPDATE users SET interest_mask = ? WHERE id = ?', user_masks())
+    if dropped:
+        logger.warning('Dropped %d stored user interests outside the interest registry: %s',
+                       sum(dropped.values()),
+                       ', '.join(f'{interest!r} ({count})' for interest, count in dropped.most_common()))
+    c.execute('DROP TABLE user_interests')
+
+
+# Schema migrations in order; PRAGMA user_version records how many have run
+MIGRATIONS = (
+    _user_interests_without_rowid,
+    _careers_change_tracking,
+    _user_interest_masks,
+)
+
+
+def migrate(conn):
+    """Apply pending schema migrations"""
+    with write_transaction(conn) as c:
+        c.execute('PRAGMA user_version')
+        applied = c.fetchone()[0]
+        for version, migration in enumerate(MIGRATIONS[applied:], applied + 1):
+            migration(c)
+            c.execute(f'PRAGMA user_version = {version}')
+
+
+# Queries run on every request; each must be answered through an index
+HOT_QUERIES = (
+    ('SELECT id FROM users WHERE email = ?', ('user@example.com',)),
+    ('SELECT id, name, email, password FROM users WHERE email = ?', ('user@example.com',)),
+    ('SELECT interest_mask FROM users WHERE id = ?', (1,)),
+    ('UPDATE users SET interest_mask = ? WHERE id = ?', (0, 1)),
+    ('SELECT version FROM catalogue_version WHERE id = 1', ()),
+)
+
+
+def check_query_plans(conn):
+    """
+    Run EXPLAIN QUERY PLAN on every hot query
+    
+    Returns:
+        List of (sql, plan detail) for steps that scan a table or build a temporary b-tree
+    """
+    failures = []
+    c = conn.cursor()
+    for sql, params in HOT_QUERIES:
+        c.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        for row in c.fetchall():
+            detail = row[-1]
+            if detail.startswith('SCAN') or 'TEMP B-TREE' in detail:
+                failures.append((sql, detail))
+    return failures
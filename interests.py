@@ -0,0 +1,127 @@
+import hashlib
+import json
+
+# Interest registry: an interest's ID is its position here and its bit in an
+# interest bitmask. Masks are stored in the database, so new interests must be
+# appended and existing ones never removed or reordered. At most 63 interests,
+# so masks fit a signed 64-bit SQLite INTEGER.
+INTEREST_REGISTRY = (
+    'Aesthetics', 'Analytics', 'Art', 'Biology', 'Business',
+    'Communication', 'Creativity', 'Design', 'Economics', 'Empathy',
+    'Engineering', 'Environment', 'Finance', 'Human Behavior', 'Innovation',
+    'Language', 'Marketing', 'Mathematics', 'Medicine', 'Nature',
+    'Physics', 'Problem Solving', 'Programming', 'Psychology', 'Research',
+    'Science', 'Social Media', 'Statistics', 'Strategy', 'Sustainability',
+    'Technology', 'Visual Arts', 'Writing'
+)
+
+# Vocabulary offered by /api/interests; saved user interests must come from it
+INTERESTS = tuple(sorted(INTEREST_REGISTRY))
+
+_CANONICAL = {interest.casefold(): interest for interest in INTERESTS}
+
+INTEREST_IDS = {interest: interest_id for interest_id, interest in enumerate(INTEREST_REGISTRY)}
+
+
+def canonical_interest(interest):
+    """Return the vocabulary spelling of interest, or None if it is not a known interest"""
+    if not isinstance(interest, str):
+        return None
+    return _CANONICAL.get(interest.strip().casefold())
+
+
+def normalize_interests(interests):
+    """
+    Deduplicate interests and map them to their vocabulary spelling
+    
+    Returns:
+        Tuple (normalized, unknown): known interests in first-seen order,
+        and the inputs that are not in the vocabulary
+    """
+    normalized = []
+    unknown = []
+    seen = set()
+    for interest in interests:
+        canonical = canonical_interest(interest)
+        if canonical is None:
+            unknown.append(interest)
+        elif canonical not in seen:
+            seen.add(canonical)
+            normalized.append(canonical)
+    return normalized, unknown
+
+
+def interest_id(interest):
+    """Return the ID of interest (in any case), or None if it is not a known interest"""
+    canonical = canonical_interest(interest)
+    return None if canonical is None else INTEREST_IDS[canonical]
+
+
+def mask_ids(mask):
+    """Yield the interest IDs set in a bitmask, lowest first"""
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+
+def interest_mask(interests):
+    """Return the bitmask of the known interests among interests"""
+    mask = 0
+    for interest in interests:
+        bit = interest_id(interest)
+        if bit is not None:
+            mask |= 1 << bit
+    return mask
+
+
+def mask_interests(mask):
+    """Return the interests set in a bitmask, in ID order"""
+    return [INTEREST_REGISTRY[bit] for bit in mask_ids(mask)]
+
+
+class InterestRelations:
+    """Which known interests each career interest is related to, as bitmasks
+
+    An interest is related to a career interest when one of its keywords
+    occurs in it, e.g. Programming (keyword 'software') is related to
+    'Software Design'. The mask of a career interest has bit
+    INTEREST_IDS[interest] set for every related interest. Masks are
+    computed once per distinct career interest, so relating a user interest
+    to a career is a bit test instead of substring scans.
+
+    ``version`` identifies the registry and keywords the masks come from, so
+    scoring state stored with a career index artifact is only reused with
+    the same relations.
+    """
+
+    def __init__(self, interest_keywords):
+        self.keywords = {}
+        for interest, keywords in interest_keywords.items():
+            related_id = interest_id(interest)
+            if related_id is not None:
+                self.keywords[related_id] = tuple(keyword.casefold() for keyword in keywords)
+        self.version = hashlib.sha1(json.dumps([INTEREST_REGISTRY, sorted(self.keywords.items())]).encode('utf-8'),
+                                    usedforsecurity=False).hexdigest()
+        self._masks = {}
+        for interest in INTERESTS:
+            self.related_mask(interest)
+
+    def related_mask(self, career_interest):
+        """Return the bitmask of interests related to one career interest"""
+        key = career_interest.casefold()
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = 0
+            for related_id, keywords in self.keywords.items():
+                if any(keyword in key for keyword in keywords):
+                    mask |= 1 << related_id
+            self._masks[key] = mask
+        return mask
+
+    def career_mask(self, career_interests):
+        """Return the bitmask of interests related to any of a career's interests"""
+        mask = 0
+        for career_interest in career_interests:
+            mask |= self.related_mask(career_interest)
+        return mask
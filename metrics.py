@@ -0,0 +1,88 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_registry = []
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with labels"""
+
+    def __init__(self, name, documentation, labelnames, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        """Record one observation, in seconds"""
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            bucket_counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    bucket_counts[i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        """Return the histogram in the Prometheus text exposition format"""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        for key, (bucket_counts, total, count) in series:
+            labels = ','.join(f'{name}="{value}"' for name, value in zip(self.labelnames, key))
+            prefix = labels + ',' if labels else ''
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total}')
+            lines.append(f'{self.name}_count{{{labels}}} {count}')
+        return '\n'.join(lines)
+
+
+def render_cache_stats(caches):
+    """Render LRUCache counters, given as {cache name: cache}"""
+    lines = []
+    for metric, stat, kind in (('career_cache_hits_total', 'hits', 'counter'),
+                               ('career_cache_misses_total', 'misses', 'counter'),
+                               ('career_cache_evictions_total', 'evictions', 'counter'),
+                               ('career_cache_entries', 'size', 'gauge')):
+        lines.append(f'# TYPE {metric} {kind}')
+        for name, cache in caches.items():
+            lines.append(f'{metric}{{cache="{name}"}} {cache.stats()[stat]}')
+    return '\n'.join(lines)
+
+
+def render_all():
+    """Render every registered histogram"""
+    return '\n'.join(histogram.render() for histogram in _registry)
+
+
+REQUEST_SECONDS = Histogram(
+    'career_request_duration_seconds', 'Time to produce a response, by endpoint', ['endpoint', 'method'])
+
+STAGE_SECONDS = Histogram(
+    'career_stage_duration_seconds', 'Time spent in each stage of request handling', ['stage'])
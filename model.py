@@ -1,9 +1,38 @@
+import heapq
 import re
-from collections import Counter
+import threading
+import weakref
+from collections import Counter, namedtuple
+from functools import lru_cache
+from itertools import islice
+
+from career_index import CareerIndex
+from interests import InterestRelations, interest_id
+from metrics import STAGE_SECONDS
+from scoring import NUMPY_AVAILABLE, VectorizedScorer, np
+
+# Upper bound on users x careers cells scored at once by get_recommendations_batch
+BATCH_SCORE_CELLS = 1 << 22
+
+# Result of matching a user against one career: the user's interests that are
+# career interests, the ones only related through keywords, and the score
+InterestMatch = namedtuple('InterestMatch', ['matched', 'related', 'score'])
+
+
+def _join_interests(interests):
+    """'A', or 'A, B, and C' for several interests"""
+    if len(interests) == 1:
+        return interests[0]
+    return ', '.join(interests[:-1]) + f", and {interests[-1]}"
+
 
 class CareerRecommendationModel:
     def __init__(self):
         self.interest_keywords = self._build_interest_keywords()
+        # Keyword relatedness of career interests, shared by scoring and explanations
+        self.relations = InterestRelations(self.interest_keywords)
+        self._scorers = weakref.WeakKeyDictionary()
+        self._scorers_lock = threading.Lock()
     
     def _build_interest_keywords(self):
         """Build a mapping of interests to related keywords"""
@@ -49,130 +78,300 @@ class CareerRecommendationModel:
             return 0
         
         career_interests = [i.strip() for i in career_interests_str.split(',')]
-        user_interests_lower = [i.lower() for i in user_interests]
-        career_interests_lower = [i.lower() for i in career_interests]
+        return self._match(user_interests, career_interests).score
+    
+    def _match(self, user_interests, career_interests):
+        """
+        Match user interests against a tokenized list of career interests in one pass
         
-        # Direct matches
-        direct_matches = sum(1 for interest in user_interests_lower 
-                           if interest in career_interests_lower)
+        Every direct match counts 1 and every user interest related to one of
+        the career interests counts 0.5, out of one per career interest.
         
-        # Keyword-based matches
+        Returns:
+            InterestMatch with the matched and related user interests and the 0-100 score
+        """
+        if not career_interests:
+            return InterestMatch((), (), 0)
+        
+        career_interests_lower = {i.lower() for i in career_interests}
+        related_mask = self.relations.career_mask(career_interests)
+        matched = []
+        related = []
         keyword_matches = 0
         for user_interest in user_interests:
-            user_interest_lower = user_interest.lower()
-            if user_interest_lower in self.interest_keywords:
-                keywords = self.interest_keywords[user_interest_lower]
-                for career_interest in career_interests:
-                    career_interest_lower = career_interest.lower()
-                    if any(keyword in career_interest_lower for keyword in keywords):
-                        keyword_matches += 0.5
-                        break
+            user_interest_id = interest_id(user_interest)
+            is_related = user_interest_id is not None and related_mask >> user_interest_id & 1
+            if is_related:
+                keyword_matches += 0.5
+            if user_interest.lower() in career_interests_lower:
+                matched.append(user_interest)
+            elif is_related:
+                related.append(user_interest)
         
         # Calculate match score (0-100)
-        total_possible = len(career_interests)
-        if total_possible == 0:
-            return 0
-        
-        match_score = min(100, ((direct_matches + keyword_matches) / total_possible) * 100)
-        return round(match_score, 1)
+        match_score = min(100, ((len(matched) + keyword_matches) / len(career_interests)) * 100)
+        return InterestMatch(tuple(matched), tuple(related), round(match_score, 1))
     
     def _generate_explanation(self, user_interests, career_interests_str, career_name, match_score):
         """Generate an explanation for why a career was recommended"""
         career_interests = [i.strip() for i in career_interests_str.split(',')]
-        user_interests_lower = [i.lower() for i in user_interests]
-        career_interests_lower = [i.lower() for i in career_interests]
-        
-        # Find matching interests
-        matching_interests = []
-        for interest in user_interests:
-            if interest.lower() in career_interests_lower:
-                matching_interests.append(interest)
+        return self._explain(self._match(user_interests, career_interests), career_name, match_score)
+    
+    def _explain(self, match, career_name, match_score):
+        """Render the explanation of an InterestMatch"""
+        tier = 2 if match_score >= 70 else 1 if match_score >= 50 else 0
+        template = self._explanation_template(min(len(match.matched), 2), min(len(match.related), 2), tier)
+        return template.format(
+            matched=_join_interests(match.matched) if match.matched else '',
+            related=_join_interests(match.related) if match.related else '',
+            career=career_name,
+            score=match_score
+        )
+    
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _explanation_template(matched, related, tier):
+        """
+        Build the explanation template for one match shape
         
-        # Find related interests
-        related_interests = []
-        for user_interest in user_interests:
-            user_interest_lower = user_interest.lower()
-            if user_interest_lower in self.interest_keywords:
-                keywords = self.interest_keywords[user_interest_lower]
-                for career_interest in career_interests:
-                    if any(keyword in career_interest.lower() for keyword in keywords):
-                        if user_interest not in matching_interests:
-                            related_interests.append(user_interest)
-                            break
-        
-        # Build explanation
+        Args:
+            matched: Number of matched interests, capped at 2 (several)
+            related: Number of related interests, capped at 2 (several)
+            tier: 2 for scores of 70 or more, 1 for 50 or more, else 0
+        """
         explanation_parts = []
         
-        if matching_interests:
-            if len(matching_interests) == 1:
-                explanation_parts.append(
-                    f"Your interest in {matching_interests[0]} directly aligns with this career path."
-                )
-            else:
-                interests_str = ', '.join(matching_interests[:-1]) + f", and {matching_interests[-1]}"
-                explanation_parts.append(
-                    f"Your interests in {interests_str} directly match the requirements for {career_name}."
-                )
-        
-        if related_interests:
-            if len(related_interests) == 1:
-                explanation_parts.append(
-                    f"Your interest in {related_interests[0]} is also relevant to this field."
-                )
-            else:
-                interests_str = ', '.join(related_interests[:-1]) + f", and {related_interests[-1]}"
-                explanation_parts.append(
-                    f"Additionally, your interests in {interests_str} complement this career."
-                )
-        
-        if match_score >= 70:
-            explanation_parts.append(
-                f"With a {match_score}% match score, {career_name} is an excellent fit for your profile."
-            )
-        elif match_score >= 50:
-            explanation_parts.append(
-                f"With a {match_score}% match score, {career_name} shows strong potential for your interests."
-            )
+        if matched == 1:
+            explanation_parts.append("Your interest in {matched} directly aligns with this career path.")
+        elif matched:
+            explanation_parts.append("Your interests in {matched} directly match the requirements for {career}.")
+        
+        if related == 1:
+            explanation_parts.append("Your interest in {related} is also relevant to this field.")
+        elif related:
+            explanation_parts.append("Additionally, your interests in {related} complement this career.")
+        
+        if tier == 2:
+            explanation_parts.append("With a {score}% match score, {career} is an excellent fit for your profile.")
+        elif tier == 1:
+            explanation_parts.append("With a {score}% match score, {career} shows strong potential for your interests.")
         else:
             explanation_parts.append(
-                f"While there's a {match_score}% match, {career_name} may still be worth exploring based on your interests."
+                "While there's a {score}% match, {career} may still be worth exploring based on your interests."
             )
         
         return ' '.join(explanation_parts)
     
-    def get_recommendations(self, user_interests, careers_data):
+    def _score_careers(self, user_interests, career_index):
+        """Score every career in the index, same formula as _calculate_interest_match"""
+        matches = {}
+        
+        # Direct matches
+        for interest in user_interests:
+            for position in career_index.keyword_index.get(interest.lower(), ()):
+                matches[position] = matches.get(position, 0) + 1
+        
+        # Keyword-based matches
+        related_positions = career_index.related_positions(self.relations)
+        for user_interest in user_interests:
+            for position in related_positions.get(interest_id(user_interest), ()):
+                matches[position] = matches.get(position, 0) + 0.5
+        
+        interest_counts = career_index.interest_counts
+        scores = [0.0 if count else 0 for count in interest_counts]
+        for position, match_count in matches.items():
+            total_possible = interest_counts[position]
+            if total_possible:
+                scores[position] = round(min(100, (match_count / total_possible) * 100), 1)
+        return scores
+    
+    def prepare(self, career_index):
+        """Build the scoring state for career_index now rather than on the first request"""
+        if NUMPY_AVAILABLE:
+            self._vector_scorer(career_index)
+        else:
+            career_index.related_positions(self.relations)
+    
+    def _vector_scorer(self, career_index):
+        """Return the VectorizedScorer for a career index, building it once on first use"""
+        scorer = self._scorers.get(career_index)
+        if scorer is None:
+            # Request threads all miss after a catalogue change; only one builds
+            with self._scorers_lock:
+                scorer = self._scorers.get(career_index)
+                if scorer is None:
+                    scorer = VectorizedScorer(career_index, self.relations)
+                    self._scorers[career_index] = scorer
+        return scorer
+    
+    @staticmethod
+    def _match_score(score, total_possible):
+        """Convert a vectorized score to the exact value _calculate_interest_match returns"""
+        if not total_possible:
+            return 0
+        if score >= 100:
+            return 100
+        return score
+    
+    @staticmethod
+    def _select_top(scores, top_k):
+        """Positions of the top_k scores, best first, ties in catalogue order"""
+        size = len(scores)
+        if top_k < size:
+            threshold = np.partition(scores, size - top_k)[size - top_k]
+            above = np.flatnonzero(scores > threshold)
+            ties = np.flatnonzero(scores == threshold)[:top_k - len(above)]
+            candidates = np.concatenate((above, ties))
+        else:
+            candidates = np.arange(size)
+        return candidates[np.lexsort((candidates, -scores[candidates]))]
+    
+    def _top_careers(self, user_interests, career_index, top_k):
+        """
+        Select the top_k careers without sorting the whole catalogue
+        
+        Ties are broken by catalogue order, exactly like a stable sort.
+        
+        Returns:
+            List of (position, match_score) tuples, best first
+        """
+        if top_k <= 0:
+            return []
+        interest_counts = career_index.interest_counts
+        
+        if NUMPY_AVAILABLE:
+            with STAGE_SECONDS.time(stage='model_build'):
+                scorer = self._vector_scorer(career_index)
+            with STAGE_SECONDS.time(stage='scoring'):
+                scores = scorer.score(user_interests)
+                candidates = self._select_top(scores, top_k)
+                return [(position, self._match_score(score, interest_counts[position]))
+                        for position, score in zip(candidates.tolist(), scores[candidates].tolist())]
+        
+        with STAGE_SECONDS.time(stage='scoring'):
+            scores = self._score_careers(user_interests, career_index)
+            top = heapq.nsmallest(top_k, range(len(scores)), key=lambda p: (-scores[p], p))
+            return [(position, scores[position]) for position in top]
+    
+    def _top_careers_by_text(self, user_interests, text_index, top_k):
+        """Select the top_k careers by TF-IDF cosine similarity"""
+        if top_k <= 0:
+            return []
+        with STAGE_SECONDS.time(stage='scoring'):
+            scores = text_index.score(user_interests, self.interest_keywords)
+            candidates = self._select_top(scores, top_k)
+            return list(zip(candidates.tolist(), scores[candidates].tolist()))
+    
+    def _top_careers_batch(self, user_interest_lists, career_index, top_k):
+        """Select the top_k careers of each user in a chunk, same ordering as _top_careers"""
+        if not NUMPY_AVAILABLE or top_k <= 0:
+            return [self._top_careers(user_interests, career_index, top_k)
+                    for user_interests in user_interest_lists]
+        
+        scores = self._vector_scorer(career_index).score_batch(user_interest_lists)
+        size = scores.shape[1]
+        
+        # Scores are multiples of 0.1, so one integer key orders by score and
+        # then by catalogue position, the same as the stable sort
+        keys = np.rint(scores * 10).astype(np.int64) * size + np.arange(size - 1, -1, -1)
+        if top_k < size:
+            candidates = np.argpartition(-keys, top_k - 1, axis=1)[:, :top_k]
+        else:
+            candidates = np.broadcast_to(np.arange(size), scores.shape)
+        order = np.argsort(-np.take_along_axis(keys, candidates, axis=1), axis=1)
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        
+        interest_counts = career_index.interest_counts
+        return [[(position, self._match_score(score, interest_counts[position]))
+                 for position, score in zip(row.tolist(), row_scores.tolist())]
+                for row, row_scores in zip(candidates, np.take_along_axis(scores, candidates, axis=1))]
+    
+    @staticmethod
+    def _as_index(careers_data):
+        """Accept either a CareerIndex or raw careers rows"""
+        if isinstance(careers_data, CareerIndex):
+            return careers_data
+        return CareerIndex.from_careers_data(careers_data)
+    
+    def _recommendation(self, user_interests, career_index, position, match_score, explain=True,
+                        compact=False):
+        """Build the response dict for one recommended career"""
+        if compact:
+            career_id = career_index.ids[position]
+            return {'id': None if career_id is None else int(career_id), 'match_score': match_score}
+        
+        name = career_index.names[position]
+        recommendation = {
+            'career': name,
+            'description': career_index.descriptions[position],
+            'match_score': match_score
+        }
+        
+        # Generate explanation
+        if explain:
+            match = self._match(user_interests, career_index.interests[position])
+            recommendation['explanation'] = self._explain(match, name, match_score)
+        
+        return recommendation
+    
+    def get_recommendations(self, user_interests, careers_data, top_k=5, text_index=None, explain=True,
+                            compact=False):
         """
         Get career recommendations based on user interests
         
         Args:
             user_interests: List of user's interests
-            careers_data: List of tuples (name, description, required_interests, skills)
+            careers_data: CareerIndex, or list of tuples (name, description, required_interests, skills)
+            top_k: Number of recommendations to return
+            text_index: Optional TextIndex built from careers_data; when given, careers are
+                ranked by TF-IDF similarity of their description, skills and interests
+            explain: Include an 'explanation' text with each recommendation
+            compact: Return only the career 'id' and 'match_score' of each recommendation
         
         Returns:
-            List of recommendation dictionaries
+            List of recommendation dictionaries, best match first
         """
-        recommendations = []
-        
-        for career in careers_data:
-            name, description, required_interests, skills = career
-            
-            # Calculate match score
-            match_score = self._calculate_interest_match(user_interests, required_interests)
-            
-            # Generate explanation
-            explanation = self._generate_explanation(
-                user_interests, required_interests, name, match_score
-            )
-            
-            recommendations.append({
-                'career': name,
-                'description': description,
-                'match_score': match_score,
-                'explanation': explanation
-            })
-        
-        # Sort by match score (descending)
-        recommendations.sort(key=lambda x: x['match_score'], reverse=True)
-        
-        # Return top 5 recommendations
-        return recommendations[:5]
\ No newline at end of file
+        career_index = self._as_index(careers_data)
+        
+        if text_index is not None:
+            top = self._top_careers_by_text(user_interests, text_index, top_k)
+        else:
+            top = self._top_careers(user_interests, career_index, top_k)
+        
+        # Explanations are only generated for the careers that are returned
+        with STAGE_SECONDS.time(stage='explanation'):
+            return [self._recommendation(user_interests, career_index, position, match_score, explain, compact)
+                    for position, match_score in top]
+    
+    def get_recommendations_batch(self, user_interest_lists, careers_data, top_k=5, chunk_size=None,
+                                  explain=True, compact=False):
+        """
+        Get career recommendations for many users
+        
+        Users are scored chunk by chunk as a users x careers matrix, so memory
+        stays bounded however many users are passed in.
+        
+        Args:
+            user_interest_lists: Iterable of interest lists, one per user
+            careers_data: CareerIndex, or list of tuples (name, description, required_interests, skills)
+            top_k: Number of recommendations per user
+            chunk_size: Users scored per chunk (default keeps chunks at BATCH_SCORE_CELLS)
+            explain: Include an 'explanation' text with each recommendation
+            compact: Return only the career 'id' and 'match_score' of each recommendation
+        
+        Yields:
+            List of recommendation dictionaries for each user, in input order
+        """
+        career_index = self._as_index(careers_data)
+        if not chunk_size:
+            chunk_size = max(1, BATCH_SCORE_CELLS // max(1, len(career_index)))
+        
+        user_interest_lists = iter(user_interest_lists)
+        while True:
+            chunk = list(islice(user_interest_lists, chunk_size))
+            if not chunk:
+                return
+            for user_interests, top in zip(chunk, self._top_careers_batch(chunk, career_index, top_k)):
+                yield [self._recommendation(user_interests, career_index, position, match_score, explain,
+                                            compact)
+                       for position, match_score in top]
@@ -0,0 +1,155 @@
+from interests import INTEREST_REGISTRY, interest_id
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, model.py falls back to pure Python scoring
+    np = None
+
+NUMPY_AVAILABLE = np is not None
+
+# Set bits of every byte value, for NumPy versions without bitwise_count
+_BYTE_BITS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8) if NUMPY_AVAILABLE else None
+
+
+def popcount(values):
+    """Number of set bits of each element of a uint64 array"""
+    if hasattr(np, 'bitwise_count'):  # NumPy 2.0+
+        return np.bitwise_count(values)
+    return _BYTE_BITS[values.view(np.uint8)].reshape(values.shape + (8,)).sum(axis=-1)
+
+
+class VectorizedScorer:
+    """Scores users against a whole CareerIndex with one sparse matrix-vector product
+
+    Interests are encoded as a fixed vocabulary of columns: one per distinct
+    career interest (direct matches, weight 1) followed by one per known
+    interest, holding the careers it is related to (keyword matches, weight
+    0.5, see InterestRelations). The careers x
+    columns matrix is binary and stored column-major (CSC), so a user only
+    touches the columns of their own interests.
+
+    Users whose interests are all in the interest registry (the usual case,
+    as saved interests are normalized) are scored from bitmasks instead:
+    each career keeps the mask of its own interests and of the interests
+    related to it, and a user's matches are two popcounts of a bitwise and.
+
+    The arrays are built by build_arrays, or viewed in place when the index
+    was memory-mapped from an artifact saved with the same relations.
+
+    Scores are identical to CareerRecommendationModel._calculate_interest_match.
+    """
+
+    def __init__(self, career_index, relations):
+        self.size = len(career_index)
+        arrays = career_index.scoring_arrays(relations)
+        if arrays is None:
+            arrays = self.build_arrays(career_index, relations)
+        related_ids, self.indptr, self.rows, self.interest_masks, self.related_masks = arrays
+
+        self.vocabulary = {interest: column for column, interest in enumerate(career_index.keyword_index)}
+        self.keyword_columns = {related_id: column
+                                for column, related_id in enumerate(related_ids, len(self.vocabulary))}
+        self.interest_counts = np.asarray(career_index.interest_counts, dtype=np.float64)
+
+    @staticmethod
+    def build_arrays(career_index, relations):
+        """
+        Build the scoring arrays of a career index
+        
+        Returns:
+            Tuple (related_ids, indptr, rows, interest_masks, related_masks): the
+            CSC matrix has one column per career interest, in keyword_index
+            order, then one per id of related_ids
+        """
+        size = len(career_index)
+        postings = []
+        interest_masks = np.zeros(size, dtype=np.uint64)
+        related_masks = np.zeros(size, dtype=np.uint64)
+
+        for interest, positions in career_index.keyword_index.items():
+            postings.append(positions)
+            bit = interest_id(interest)
+            if bit is not None and interest == INTEREST_REGISTRY[bit].lower():
+                interest_masks[np.asarray(positions, dtype=np.int64)] |= np.uint64(1 << bit)
+
+        related = career_index.related_positions(relations)
+        for related_id, positions in related.items():
+            postings.append(positions)
+            related_masks[np.asarray(positions, dtype=np.int64)] |= np.uint64(1 << related_id)
+
+        indptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        np.cumsum([len(positions) for positions in postings], out=indptr[1:])
+        rows = (np.concatenate([np.asarray(positions, dtype=np.int64) for positions in postings])
+                if postings else np.zeros(0, dtype=np.int64))
+        return list(related), indptr, rows, interest_masks, related_masks
+
+    def _user_weights(self, user_interests):
+        """Encode a user's interests as {column: weight}"""
+        weights = {}
+        for interest in user_interests:
+            column = self.vocabulary.get(interest.lower())
+            if column is not None:
+                weights[column] = weights.get(column, 0) + 1
+            column = self.keyword_columns.get(interest_id(interest))
+            if column is not None:
+                weights[column] = weights.get(column, 0) + 0.5
+        return weights
+
+    def _user_mask(self, user_interests):
+        """
+        Encode a user's interests as a bitmask, or None if it wouldn't score the same
+        
+        That is the case when an interest is given twice (it counts twice), is
+        outside the registry but still names a career interest, or only maps
+        to a registry interest once stripped (' Art ' is related to careers
+        like 'Art' is, but is no direct match).
+        """
+        mask = 0
+        for interest in user_interests:
+            bit = interest_id(interest)
+            if bit is None:
+                if interest.lower() in self.vocabulary:
+                    return None
+            elif mask >> bit & 1 or interest.lower() != INTEREST_REGISTRY[bit].lower():
+                return None
+            else:
+                mask |= 1 << bit
+        return mask
+
+    def _mask_matches(self, user_masks):
+        """Direct matches plus half the related matches, from interest bitmasks"""
+        return popcount(self.interest_masks & user_masks) + 0.5 * popcount(self.related_masks & user_masks)
+
+    def _add_matches(self, matches, user_interests):
+        """Add a user's matches to a row of zeros, column by column"""
+        for column, weight in self._user_weights(user_interests).items():
+            matches[self.rows[self.indptr[column]:self.indptr[column + 1]]] += weight
+
+    def score(self, user_interests):
+        """Return the match score (0-100, rounded to 0.1) of every career"""
+        mask = self._user_mask(user_interests)
+        if mask is not None:
+            return self._to_scores(self._mask_matches(np.uint64(mask)))
+        matches = np.zeros(self.size)
+        self._add_matches(matches, user_interests)
+        return self._to_scores(matches)
+
+    def score_batch(self, user_interest_lists):
+        """Return a users x careers matrix of match scores"""
+        matches = np.zeros((len(user_interest_lists), self.size))
+        masks = [self._user_mask(user_interests) for user_interests in user_interest_lists]
+        rows = [row for row, mask in enumerate(masks) if mask is not None]
+        if rows:
+            user_masks = np.array([masks[row] for row in rows], dtype=np.uint64)[:, None]
+            matches[rows] = self._mask_matches(user_masks)
+        for user_matches, mask, user_interests in zip(matches, masks, user_interest_lists):
+            if mask is None:
+                self._add_matches(user_matches, user_interests)
+        return self._to_scores(matches)
+
+    def _to_scores(self, matches):
+        """Turn raw match counts into 0-100 scores, same arithmetic as the Python path"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.minimum(100, (matches / self.interest_counts) * 100)
+        scores[..., self.interest_counts == 0] = 0
+        return np.round(scores, 1)
@@ -0,0 +1,67 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import database
+from career_index import get_career_index
+from model import CareerRecommendationModel
+
+# Per worker process state, set up by _init_worker
+_db_path = None
+_artifact_path = None
+_model = None
+
+
+def _init_worker(db_path, artifact_path):
+    global _db_path, _artifact_path, _model
+    _db_path = db_path
+    _artifact_path = artifact_path
+    _model = CareerRecommendationModel()
+    # Map the career index and set up the scorer up front rather than on the first request
+    _model.prepare(get_career_index(database.get_connection(db_path), artifact_path))
+
+
+def _recommend(user_interests, top_k, explain, compact):
+    """Score one user inside a pool process against its own copy of the career index"""
+    career_index = get_career_index(database.get_connection(_db_path), _artifact_path)
+    return _model.get_recommendations(user_interests, career_index, top_k, explain=explain, compact=compact)
+
+
+class ScoringPool:
+    """Process pool that scores large catalogues outside the web worker's GIL
+
+    Each pool process keeps its own career index and model, refreshed from
+    the database when the catalogue version changes, so requests only ship
+    the user's interests in and the top-k recommendations back.
+    """
+
+    def __init__(self, db_path, processes, artifact_path=None):
+        # Never fork a multi-threaded web worker
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        self._executor = ProcessPoolExecutor(processes, mp_context=context,
+                                             initializer=_init_worker,
+                                             initargs=(os.path.abspath(db_path),
+                                                       artifact_path and os.path.abspath(artifact_path)))
+
+    def recommend(self, user_interests, top_k, explain=True, compact=False):
+        """Return recommendations computed in a pool process"""
+        return self._executor.submit(_recommend, list(user_interests), top_k, explain, compact).result()
+
+    def shutdown(self):
+        self._executor.shutdown()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_scoring_pool(db_path, processes, artifact_path=None):
+    """Return the process-wide ScoringPool, starting it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ScoringPool(db_path, processes, artifact_path)
+    return _pool
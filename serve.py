@@ -0,0 +1,38 @@
+"""
+Production server: the ASGI app on uvicorn with several worker processes
+
+    python serve.py --workers 4 --threads 32 --scoring-processes 2
+"""
+import argparse
+import os
+
+import uvicorn
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the career recommendation API in production mode')
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_WORKERS', os.cpu_count() or 1)),
+                        help='Worker processes accepting requests')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', 32)),
+                        help='Request threads per worker process')
+    parser.add_argument('--scoring-processes', type=int, default=int(os.environ.get('SCORING_PROCESSES', 0)),
+                        help='Scoring processes per worker for large catalogues (0 scores in the request thread)')
+    parser.add_argument('--backlog', type=int, default=2048)
+    args = parser.parse_args()
+
+    # Read by app.py in every worker process
+    os.environ['WEB_THREADS'] = str(args.threads)
+    os.environ['SCORING_PROCESSES'] = str(args.scoring_processes)
+
+    # Create and migrate the schema once, before the workers start
+    from app import init_db
+    init_db()
+
+    uvicorn.run('asgi:application', host=args.host, port=args.port, workers=args.workers,
+                backlog=args.backlog, log_level='info')
+
+
+if __name__ == '__main__':
+    main()
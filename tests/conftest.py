@@ -0,0 +1,14 @@
+import pytest
+
+import database
+from app import app
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Point the app at a fresh database (and career index artifact) in tmp_path"""
+    path = str(tmp_path / 'career_recommendations.db')
+    monkeypatch.setitem(app.config, 'DATABASE', path)
+    monkeypatch.setitem(app.config, 'CAREER_INDEX_PATH', str(tmp_path / 'career_index.bin'))
+    yield path
+    database.close_connections()
@@ -0,0 +1,28 @@
+"""Request validation of the API endpoints"""
+import pytest
+
+from app import app
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setitem(app.config, 'BATCH_API_KEY', 'batch-key')
+    return app.test_client()
+
+
+@pytest.mark.parametrize('body', [
+    [1, 2],
+    'user_ids',
+    {'user_ids': 5},
+    {'user_ids': '12'},
+    {'user_ids': [1, '2']},
+    {'user_ids': [True]},
+    {'limit': '5'},
+    {'limit': True},
+    {'explain': 'no'},
+    {'compact': 1},
+])
+def test_batch_rejects_malformed_bodies(client, body):
+    response = client.post('/api/recommendations/batch', json=body, headers={'X-Batch-Key': 'batch-key'})
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
@@ -0,0 +1,16 @@
+"""Startup of the ASGI entry point"""
+import importlib
+
+import pytest
+
+import career_index
+
+pytest.importorskip('a2wsgi')
+
+
+def test_starts_on_fresh_database(db_path, monkeypatch):
+    monkeypatch.setattr(career_index, '_index', None)
+    import asgi
+    importlib.reload(asgi)
+
+    assert career_index._index is not None and len(career_index._index) > 0
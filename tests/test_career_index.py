@@ -0,0 +1,166 @@
+"""The career index artifact format and incremental index updates"""
+import random
+
+import pytest
+
+import career_index
+import database
+from app import init_db
+from career_index import CareerIndex, get_career_index
+from interests import INTERESTS, InterestRelations
+from model import CareerRecommendationModel
+from scoring import NUMPY_AVAILABLE, VectorizedScorer
+
+requires_numpy = pytest.mark.skipif(not NUMPY_AVAILABLE, reason='NumPy is not installed')
+
+EXTRA_CAREERS = [
+    ('Café Owner', 'Runs a café — coffee, food and people.', 'Business,Communication', None),
+    ('Curator', 'Looks after collections.', 'Art, Research ,Visual Arts', ''),
+    ('Generalist', 'Does a bit of everything.', 'Basket Weaving', 'Juggling, Patience'),
+]
+
+
+def as_list(values):
+    return values.tolist() if hasattr(values, 'tolist') else list(values)
+
+
+def index_columns(career_index):
+    """Every column of an index as plain Python values, for comparisons"""
+    return {
+        'version': career_index.version,
+        'ids': as_list(career_index.ids),
+        'names': list(career_index.names),
+        'descriptions': list(career_index.descriptions),
+        'skills': list(career_index.skills),
+        'interests': list(career_index.interests),
+        'interest_counts': as_list(career_index.interest_counts),
+        'keyword_index': {interest: as_list(positions)
+                          for interest, positions in career_index.keyword_index.items()},
+    }
+
+
+@pytest.fixture
+def conn(db_path):
+    init_db()
+    conn = database.get_connection(db_path)
+    database.upsert_careers(conn, EXTRA_CAREERS)
+    return conn
+
+
+@requires_numpy
+def test_artifact_round_trip(conn, tmp_path):
+    expected = CareerIndex.from_db(conn)
+    path = str(tmp_path / 'career_index.bin')
+    expected.save(path)
+    loaded = CareerIndex.load(path)
+
+    assert index_columns(loaded) == index_columns(expected)
+    assert loaded.skills[loaded.position(expected.ids[-3])] is None
+    assert loaded.skills[loaded.position(expected.ids[-2])] == ''
+
+
+@requires_numpy
+def test_artifact_stores_scoring_arrays(conn, tmp_path):
+    recommendation_model = CareerRecommendationModel()
+    expected = CareerIndex.from_db(conn)
+    path = str(tmp_path / 'career_index.bin')
+    expected.save(path, relations=recommendation_model.relations)
+    loaded = CareerIndex.load(path)
+
+    assert index_columns(loaded) == index_columns(expected)
+    assert loaded.scoring_arrays(recommendation_model.relations) is not None
+    assert ({related_id: as_list(positions)
+             for related_id, positions in loaded.related_positions(recommendation_model.relations).items()}
+            == expected.related_positions(recommendation_model.relations))
+
+    stored = VectorizedScorer(loaded, recommendation_model.relations)
+    built = VectorizedScorer(expected, recommendation_model.relations)
+    rng = random.Random(0)
+    users = [rng.sample(INTERESTS, rng.randint(1, 6)) for _ in range(50)] + [['Basket Weaving'], [' Art ']]
+    assert stored.score_batch(users).tolist() == built.score_batch(users).tolist()
+    assert [stored.score(user_interests).tolist() for user_interests in users] == built.score_batch(users).tolist()
+
+
+@requires_numpy
+def test_scoring_arrays_need_the_same_relations(conn, tmp_path):
+    path = str(tmp_path / 'career_index.bin')
+    CareerIndex.from_db(conn).save(path, relations=CareerRecommendationModel().relations)
+    loaded = CareerIndex.load(path)
+
+    other_relations = InterestRelations({'Art': ['art', 'painting']})
+    assert loaded.scoring_arrays(other_relations) is None
+    assert loaded.related_positions(other_relations) == CareerIndex.from_db(conn).related_positions(other_relations)
+
+
+@pytest.fixture
+def artifact_path(request, conn, tmp_path, monkeypatch):
+    """None, or an artifact of the current catalogue to start from"""
+    monkeypatch.setattr(career_index, '_index', None)
+    if request.param and NUMPY_AVAILABLE:
+        path = str(tmp_path / 'career_index.bin')
+        CareerIndex.from_db(conn).save(path, relations=CareerRecommendationModel().relations)
+        return path
+    if request.param:
+        pytest.skip('NumPy is not installed')
+    return None
+
+
+@pytest.fixture
+def updates(monkeypatch):
+    """Count the incremental updates applied by get_career_index"""
+    applied = []
+    updated = CareerIndex.updated
+
+    def counting_updated(index, careers_rows, version):
+        result = updated(index, careers_rows, version)
+        applied.append(result is not None)
+        return result
+
+    monkeypatch.setattr(CareerIndex, 'updated', counting_updated)
+    return applied
+
+
+def assert_current(conn, artifact_path):
+    assert index_columns(get_career_index(conn, artifact_path)) == index_columns(CareerIndex.from_db(conn))
+
+
+@pytest.mark.parametrize('artifact_path', [False, True], indirect=True, ids=['from_db', 'artifact'])
+def test_upserts_update_the_index_incrementally(conn, artifact_path, updates):
+    index = get_career_index(conn, artifact_path)
+    assert_current(conn, artifact_path)
+
+    # Unchanged rows don't bump the catalogue version
+    database.upsert_careers(conn, EXTRA_CAREERS)
+    assert get_career_index(conn, artifact_path) is index
+
+    database.upsert_careers(conn, [
+        ('Curator', 'Looks after museum collections.', 'Art,History', 'Cataloguing'),
+        ('Café Owner', 'Runs a café — coffee, food and people.', 'Business', 'Hospitality'),
+        ('Data Engineer', 'Builds data pipelines.', 'Technology,Programming,Analytics', None),
+    ])
+    assert_current(conn, artifact_path)
+    database.upsert_careers(conn, [('Archivist', 'Keeps records.', 'Research,Writing', 'Archiving')])
+    assert_current(conn, artifact_path)
+    assert updates == [True, True]
+
+
+@pytest.mark.parametrize('artifact_path', [False, True], indirect=True, ids=['from_db', 'artifact'])
+def test_delete_rebuilds_the_index(conn, artifact_path, updates):
+    get_career_index(conn, artifact_path)
+    with database.write_transaction(conn) as c:
+        c.execute("DELETE FROM careers WHERE name = 'Curator'")
+    database.upsert_careers(conn, [('Archivist', 'Keeps records.', 'Research,Writing', 'Archiving')])
+
+    assert_current(conn, artifact_path)
+    assert updates == []
+
+
+@pytest.mark.parametrize('artifact_path', [False, True], indirect=True, ids=['from_db', 'artifact'])
+def test_out_of_order_id_rebuilds_the_index(conn, artifact_path, updates):
+    get_career_index(conn, artifact_path)
+    with database.write_transaction(conn) as c:
+        c.execute("""INSERT INTO careers (id, name, description, required_interests, skills)
+                     VALUES (0, 'Pioneer', 'Came first.', 'Innovation', NULL)""")
+
+    assert_current(conn, artifact_path)
+    assert updates == [False]
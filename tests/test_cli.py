@@ -0,0 +1,24 @@
+"""The bulk loading CLI commands"""
+import database
+from app import app, init_db
+
+
+def test_import_interests_skips_bad_rows(db_path, tmp_path):
+    init_db()
+    with database.write_transaction(database.get_connection(db_path)) as c:
+        c.execute("INSERT INTO users (name, email, password) VALUES ('User', 'user@example.com', 'hash')")
+
+    path = tmp_path / 'interests.csv'
+    path.write_text('user_id,interest\n'
+                    '1,Art\n'
+                    '²,Art\n'
+                    '99999999999999999999,Art\n'
+                    'one,Art\n'
+                    '1,Basket Weaving\n'
+                    ' 1 ,technology\n', encoding='utf-8')
+    result = app.test_cli_runner().invoke(args=['import-interests', str(path)])
+
+    assert result.exit_code == 0, result.output
+    assert 'Done: 2 rows processed, 4 rows skipped' in result.output
+    # init_db, run by the command, closes this thread's connections
+    assert database.get_user_interests(database.get_connection(db_path), 1) == ['Art', 'Technology']
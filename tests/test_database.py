@@ -0,0 +1,55 @@
+"""Schema migrations and the query plans of the hot queries"""
+import sqlite3
+
+import pytest
+
+import database
+from app import init_db
+
+# Schema written by the first release, before any migration existed
+BASELINE_SCHEMA = '''
+CREATE TABLE users
+    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+     name TEXT NOT NULL,
+     email TEXT UNIQUE NOT NULL,
+     password TEXT NOT NULL,
+     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+CREATE TABLE user_interests
+    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+     user_id INTEGER NOT NULL,
+     interest TEXT NOT NULL,
+     FOREIGN KEY (user_id) REFERENCES users (id));
+CREATE TABLE careers
+    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+     name TEXT UNIQUE NOT NULL,
+     description TEXT NOT NULL,
+     required_interests TEXT NOT NULL,
+     skills TEXT);
+'''
+
+
+@pytest.fixture
+def baseline_db_path(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute("INSERT INTO users (name, email, password) VALUES ('User', 'user@example.com', 'hash')")
+    conn.executemany('INSERT INTO user_interests (user_id, interest) VALUES (1, ?)',
+                     [('Art',), ('technology',), ('Basket Weaving',)])
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def test_hot_queries_use_indexes(db_path):
+    init_db()
+    assert database.check_query_plans(database.get_connection(db_path)) == []
+
+
+def test_baseline_database_upgrades(baseline_db_path):
+    init_db()
+    init_db()
+
+    conn = database.get_connection(baseline_db_path)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == len(database.MIGRATIONS)
+    assert database.get_user_interests(conn, 1) == ['Art', 'Technology']
+    assert database.check_query_plans(conn) == []
@@ -0,0 +1,160 @@
+"""Parity of the interest scoring implementations on randomized catalogues
+
+The same match formula is computed by _calculate_interest_match (the
+reference), _score_careers (pure Python), VectorizedScorer.score and
+score_batch (bitmask and sparse paths), and the rankings of
+get_recommendations and get_recommendations_batch must agree with it.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import model
+from career_index import CareerIndex
+from interests import INTEREST_REGISTRY
+from model import CareerRecommendationModel
+from scoring import NUMPY_AVAILABLE, VectorizedScorer
+
+requires_numpy = pytest.mark.skipif(not NUMPY_AVAILABLE, reason='NumPy is not installed')
+
+SEEDS = range(20)
+
+# Career interests: registry ones, others that only relate through keywords
+# (Programming's 'software' in 'Software Design') and unrelated ones
+CAREER_INTERESTS = list(INTEREST_REGISTRY) + [
+    'Software Design', 'Data Visualization', 'Creative Writing', 'Basket Weaving'
+]
+USER_INTERESTS = list(INTEREST_REGISTRY) + ['Basket Weaving', 'Data Visualization', 'Quantum Knitting']
+
+
+def random_careers(rng):
+    """Careers rows drawn from a small vocabulary, so many scores tie"""
+    vocabulary = rng.sample(CAREER_INTERESTS, rng.randint(3, 12))
+    careers = []
+    for position in range(rng.randint(1, 80)):
+        if rng.random() < 0.05:
+            required_interests = ''
+        else:
+            required_interests = ','.join(rng.sample(vocabulary, rng.randint(1, min(6, len(vocabulary)))))
+        careers.append((f'Career {position}', f'Description {position}', required_interests, 'Skills'))
+    return careers
+
+
+def random_user(rng):
+    """A user's interests, sometimes in another case, padded, or with an interest given twice"""
+    interests = rng.sample(USER_INTERESTS, rng.randint(0, 8))
+    if interests and rng.random() < 0.2:
+        interests[0] = interests[0].lower()
+    if interests and rng.random() < 0.2:
+        interests[-1] = f' {interests[-1]} '
+    if interests and rng.random() < 0.1:
+        interests.append(interests[-1])
+    return interests
+
+
+def random_case(seed):
+    rng = random.Random(seed)
+    careers = random_careers(rng)
+    users = [random_user(rng) for _ in range(rng.randint(1, 30))]
+    return careers, CareerIndex.from_careers_data(careers), users
+
+
+@pytest.fixture(scope='module')
+def recommendation_model():
+    return CareerRecommendationModel()
+
+
+def reference_scores(recommendation_model, user_interests, careers):
+    return [recommendation_model._calculate_interest_match(user_interests, required_interests)
+            for _, _, required_interests, _ in careers]
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_score_careers_matches_reference(recommendation_model, seed):
+    careers, career_index, users = random_case(seed)
+    for user_interests in users:
+        assert (recommendation_model._score_careers(user_interests, career_index)
+                == reference_scores(recommendation_model, user_interests, careers))
+
+
+@requires_numpy
+@pytest.mark.parametrize('seed', SEEDS)
+def test_vectorized_scores_match_reference(recommendation_model, seed):
+    careers, career_index, users = random_case(seed)
+    scorer = recommendation_model._vector_scorer(career_index)
+    expected = [reference_scores(recommendation_model, user_interests, careers) for user_interests in users]
+
+    assert [scorer.score(user_interests).tolist() for user_interests in users] == expected
+    assert scorer.score_batch(users).tolist() == expected
+
+
+@requires_numpy
+def test_padded_interest_is_no_direct_match(recommendation_model):
+    # ' Art ' is related to 'Art' through its keywords but doesn't equal it
+    career_index = CareerIndex.from_careers_data([('Artist', 'Paints', 'Art', 'Painting')])
+    scorer = recommendation_model._vector_scorer(career_index)
+
+    assert recommendation_model._calculate_interest_match([' Art '], 'Art') == 50.0
+    assert scorer.score([' Art ']).tolist() == [50.0]
+    assert scorer.score_batch([[' Art '], ['Art']]).tolist() == [[50.0], [100.0]]
+
+
+@requires_numpy
+@pytest.mark.parametrize('seed', SEEDS)
+def test_batch_rankings_match_single(recommendation_model, seed):
+    _, career_index, users = random_case(seed)
+    for top_k in (1, 3, len(career_index) + 1):
+        expected = [recommendation_model.get_recommendations(user_interests, career_index, top_k)
+                    for user_interests in users]
+        assert list(recommendation_model.get_recommendations_batch(users, career_index, top_k)) == expected
+        assert list(recommendation_model.get_recommendations_batch(users, career_index, top_k,
+                                                                   chunk_size=7)) == expected
+
+
+@requires_numpy
+@pytest.mark.parametrize('seed', SEEDS)
+def test_rankings_without_numpy_match(recommendation_model, seed, monkeypatch):
+    _, career_index, users = random_case(seed)
+    expected = [recommendation_model.get_recommendations(user_interests, career_index, 3)
+                for user_interests in users]
+
+    monkeypatch.setattr(model, 'NUMPY_AVAILABLE', False)
+    assert [recommendation_model.get_recommendations(user_interests, career_index, 3)
+            for user_interests in users] == expected
+
+
+@requires_numpy
+def test_concurrent_first_requests_build_one_scorer(monkeypatch):
+    _, career_index, _ = random_case(0)
+    recommendation_model = CareerRecommendationModel()
+    builds = []
+    build_related_positions = CareerIndex._build_related_positions
+
+    class SlowScorer(VectorizedScorer):
+        def __init__(self, *args):
+            builds.append('scorer')
+            time.sleep(0.05)
+            super().__init__(*args)
+
+    def slow_related_positions(index, relations):
+        builds.append('related')
+        time.sleep(0.05)
+        return build_related_positions(index, relations)
+
+    monkeypatch.setattr(model, 'VectorizedScorer', SlowScorer)
+    monkeypatch.setattr(CareerIndex, '_build_related_positions', slow_related_positions)
+
+    threads = 16
+    barrier = threading.Barrier(threads)
+
+    def first_request(_):
+        barrier.wait()
+        return recommendation_model._vector_scorer(career_index)
+
+    with ThreadPoolExecutor(threads) as executor:
+        scorers = list(executor.map(first_request, range(threads)))
+    assert sorted(builds) == ['related', 'scorer']
+    assert all(scorer is scorers[0] for scorer in scorers)
@@ -0,0 +1,51 @@
+"""Loading the stored TF-IDF index"""
+import logging
+
+import pytest
+
+import text_similarity
+from career_index import CareerIndex
+from model import CareerRecommendationModel
+from scoring import NUMPY_AVAILABLE
+from text_similarity import TextIndex, get_text_index
+
+CAREERS = [
+    ('Software Developer', 'Writes software.', 'Technology,Programming', 'Python'),
+    ('Graphic Designer', 'Designs visuals.', 'Art,Design', None),
+]
+
+
+@pytest.fixture(autouse=True)
+def no_loaded_index(monkeypatch):
+    monkeypatch.setattr(text_similarity, '_loaded', None)
+
+
+def warnings(caplog):
+    return [record for record in caplog.records
+            if record.name == 'text_similarity' and record.levelno == logging.WARNING]
+
+
+def test_missing_index_is_logged_once_per_catalogue_version(tmp_path, caplog):
+    path = str(tmp_path / 'career_text_index.npz')
+    career_index = CareerIndex([(1, *CAREERS[0])], version=1)
+    for _ in range(3):
+        assert get_text_index(path, career_index) is None
+    assert len(warnings(caplog)) == 1
+
+    career_index = CareerIndex([(1, *CAREERS[0])], version=2)
+    assert get_text_index(path, career_index) is None
+    assert len(warnings(caplog)) == 2
+
+
+@pytest.mark.skipif(not NUMPY_AVAILABLE, reason='NumPy is not installed')
+def test_stale_index_is_logged_once(tmp_path, caplog):
+    path = str(tmp_path / 'career_text_index.npz')
+    career_index = CareerIndex(((position, *career) for position, career in enumerate(CAREERS, 1)), version=1)
+    TextIndex.build(career_index, CareerRecommendationModel().interest_keywords).save(path)
+    assert get_text_index(path, career_index) is not None
+    assert warnings(caplog) == []
+
+    changed = CareerIndex(((position, *career) for position, career in enumerate(CAREERS, 1)), version=2)
+    for _ in range(3):
+        assert get_text_index(path, changed) is None
+    assert len(warnings(caplog)) == 1
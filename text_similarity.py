@@ -0,0 +1,181 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+from interests import canonical_interest
+from scoring import NUMPY_AVAILABLE, np
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+STOP_WORDS = frozenset('''
+    a an and are as at be by can for from has have in into is it its of on or
+    that the their them they this to use used using various with who what which
+'''.split())
+
+# Bumped whenever the stored layout changes; older files are ignored
+FORMAT_VERSION = 1
+
+
+def tokenize(text):
+    """Lowercase word tokens of text, without stop words"""
+    if not text:
+        return []
+    return [token for token in TOKEN_PATTERN.findall(text.lower())
+            if len(token) > 1 and token not in STOP_WORDS]
+
+
+def interest_terms(interests, interest_keywords):
+    """Tokens of the interests themselves plus the keywords related to each of them"""
+    terms = []
+    for interest in interests:
+        terms.extend(tokenize(interest))
+        for keyword in interest_keywords.get(canonical_interest(interest), ()):
+            terms.extend(tokenize(keyword))
+    return terms
+
+
+class TextIndex:
+    """TF-IDF matrix over career descriptions, skills and interests
+
+    Each career is a document made of its description, its skills, its
+    required interests and the related keywords of those interests. Rows are
+    L2-normalized and stored column-major (one posting list per term), so a
+    query only touches the postings of its own terms and the result is the
+    cosine similarity with every career.
+
+    Building is done offline (``flask build-text-index``); requests only load
+    the stored arrays and score.
+    """
+
+    def __init__(self, vocabulary, idf, indptr, rows, weights, career_ids, catalogue_version):
+        self.vocabulary = {term: column for column, term in enumerate(vocabulary)}
+        self.idf = idf
+        self.indptr = indptr
+        self.rows = rows
+        self.weights = weights
+        self.career_ids = career_ids
+        self.catalogue_version = catalogue_version
+
+    def __len__(self):
+        return len(self.career_ids)
+
+    @classmethod
+    def build(cls, career_index, interest_keywords):
+        """Build the TF-IDF matrix for every career of a CareerIndex"""
+        vocabulary = {}
+        document_terms = []
+        for position in range(len(career_index)):
+            tokens = (tokenize(career_index.descriptions[position])
+                      + tokenize(career_index.skills[position])
+                      + interest_terms(career_index.interests[position], interest_keywords))
+            counts = Counter(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+            document_terms.append(counts)
+
+        document_count = len(document_terms)
+        document_frequency = np.zeros(len(vocabulary))
+        for counts in document_terms:
+            document_frequency[list(counts)] += 1
+        # Smoothed idf, as in scikit-learn's TfidfTransformer
+        idf = np.log((1 + document_count) / (1 + document_frequency)) + 1
+
+        terms, rows, weights = [], [], []
+        for position, counts in enumerate(document_terms):
+            row_weights = [count * idf[term] for term, count in counts.items()]
+            norm = math.sqrt(sum(weight * weight for weight in row_weights)) or 1.0
+            terms.extend(counts)
+            rows.extend([position] * len(counts))
+            weights.extend(weight / norm for weight in row_weights)
+
+        terms = np.asarray(terms, dtype=np.int64)
+        order = np.argsort(terms, kind='stable')
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(vocabulary)), out=indptr[1:])
+
+        career_ids = np.asarray([-1 if career_id is None else career_id for career_id in career_index.ids],
+                                dtype=np.int64)
+        return cls(list(vocabulary), idf, indptr,
+                   np.asarray(rows, dtype=np.int64)[order],
+                   np.asarray(weights, dtype=np.float64)[order],
+                   career_ids, career_index.version)
+
+    def save(self, path):
+        """Write the index to an .npz file"""
+        header = json.dumps({'format': FORMAT_VERSION, 'catalogue_version': self.catalogue_version})
+        with open(path, 'wb') as f:
+            np.savez(f, header=np.array(header), vocabulary=np.array(list(self.vocabulary), dtype=str),
+                     idf=self.idf, indptr=self.indptr, rows=self.rows, weights=self.weights,
+                     career_ids=self.career_ids)
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by save, or return None if its format is outdated"""
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(str(data['header']))
+            if header.get('format') != FORMAT_VERSION:
+                return None
+            return cls(data['vocabulary'].tolist(), data['idf'], data['indptr'], data['rows'],
+                       data['weights'], data['career_ids'], header['catalogue_version'])
+
+    def matches(self, career_index):
+        """Whether this index was built from exactly the careers of career_index"""
+        return (self.catalogue_version == career_index.version
+                and len(self) == len(career_index)
+                and self.career_ids.tolist() == [-1 if i is None else i for i in career_index.ids])
+
+    def score(self, user_interests, interest_keywords):
+        """Return the cosine similarity (0-100, rounded to 0.1) of the user with every career"""
+        counts = Counter(term for term in interest_terms(user_interests, interest_keywords)
+                         if term in self.vocabulary)
+        query = {self.vocabulary[term]: count * self.idf[self.vocabulary[term]] for term, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in query.values())) or 1.0
+
+        similarity = np.zeros(len(self))
+        for column, weight in query.items():
+            start, end = self.indptr[column], self.indptr[column + 1]
+            similarity[self.rows[start:end]] += (weight / norm) * self.weights[start:end]
+        return np.round(similarity * 100, 1)
+
+
+_loaded = None
+_loaded_lock = threading.Lock()
+
+
+def get_text_index(path, career_index):
+    """
+    Return the stored TextIndex for the current catalogue
+
+    The file is read once per (file, catalogue version); None is returned,
+    with a warning logged once, if it is missing, unreadable or was built
+    from a different catalogue.
+    """
+    global _loaded
+    try:
+        modified = os.stat(path).st_mtime_ns
+    except OSError:
+        modified = None
+
+    key = (path, modified, career_index.version)
+    loaded = _loaded
+    if loaded is None or loaded[0] != key:
+        with _loaded_lock:
+            if _loaded is None or _loaded[0] != key:
+                text_index = None
+                if NUMPY_AVAILABLE and modified is not None:
+                    try:
+                        text_index = TextIndex.load(path)
+                    except (OSError, ValueError, KeyError):
+                        pass
+                    if text_index is not None and not text_index.matches(career_index):
+                        text_index = None
+                if text_index is None:
+                    logger.warning('No up-to-date text index at %s for catalogue version %s, using interest scoring',
+                                   path, career_index.version)
+                _loaded = (key, text_index)
+            loaded = _loaded
+    return loaded[1]